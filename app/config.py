@@ -16,9 +16,17 @@ class Config:
     GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID", "")
     GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET", "")
     GOOGLE_REDIRECT_URI = os.getenv("GOOGLE_REDIRECT_URI", "http://localhost:8000/auth/callback")
+    # Pages Search Analytics récupérées en parallèle (par vague, au moins 1)
+    GSC_CONCURRENT_PAGES = max(1, int(os.getenv("GSC_CONCURRENT_PAGES", 4)))
+    # Token OAuth (refresh_token, client_secret) : à placer hors de l'arborescence en production
+    GSC_TOKEN_PATH = os.getenv("GSC_TOKEN_PATH", os.path.join("models", "gsc_token.json"))
     
     # Application
     DEBUG = os.getenv("DEBUG", "True").lower() == "true"
+    # Workers uvicorn hors mode DEBUG : chacun charge son propre modèle d'embeddings et
+    # exécute ses jobs en mémoire, à augmenter selon la RAM disponible (pas os.cpu_count(),
+    # qui renvoie les CPU de l'hôte dans un conteneur)
+    API_WORKERS = max(1, int(os.getenv("API_WORKERS", 2)))
     ROOT_PATH = os.getenv("ROOT_PATH", "")
     DOMAIN = os.getenv("DOMAIN", "localhost")
     MAX_KEYWORDS = int(os.getenv("MAX_KEYWORDS", 1000000))
@@ -34,6 +42,12 @@ class Config:
     CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", 128))
     EMBEDDING_DIMENSION = int(os.getenv("EMBEDDING_DIMENSION", 384))
     
+    # Encodage des embeddings : taille de lot et nombre de processus (1 = encodage local)
+    EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 64))
+    EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", 1))
+    # En dessous de ce nombre de chunks, le coût de répartition dépasse le gain
+    EMBEDDING_MULTIPROCESS_MIN_TEXTS = int(os.getenv("EMBEDDING_MULTIPROCESS_MIN_TEXTS", 2000))
+    
     # Pondération du score hybride
     WEIGHTS = {
         "embedding": float(os.getenv("EMBEDDING_WEIGHT", 0.55)),
@@ -49,6 +63,17 @@ class Config:
     # Monitoring
     ENABLE_PROMETHEUS = os.getenv("ENABLE_PROMETHEUS", "True").lower() == "true"
     PROMETHEUS_PORT = int(os.getenv("PROMETHEUS_PORT", 9090))
+    # Dossier des fichiers de métriques partagés entre workers (mode multiprocess)
+    PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR", "prometheus_multiproc")
+    
+    # Exports
+    # Au-delà de ce nombre de lignes, l'Excel est écrit en mémoire constante (chaînes inline)
+    # plutôt qu'avec la table de chaînes partagées, qui déduplique les URLs répétées
+    EXCEL_CONSTANT_MEMORY_ROW_LIMIT = int(os.getenv("EXCEL_CONSTANT_MEMORY_ROW_LIMIT", 200000))
+    # Au-delà de ce nombre de lignes, un onglet Excel n'est stylé que sur son en-tête
+    EXCEL_FULL_FORMAT_ROW_LIMIT = int(os.getenv("EXCEL_FULL_FORMAT_ROW_LIMIT", 5000))
+    # Compression gzip des exports JSON et HTML (.json.gz / .html.gz)
+    EXPORT_GZIP = os.getenv("EXPORT_GZIP", "True").lower() == "true"
     
     # Modèle d'embeddings
     EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
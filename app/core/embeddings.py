@@ -6,9 +6,11 @@ from typing import List, Dict, Tuple, Optional
 from sentence_transformers import SentenceTransformer
 import logging
 from concurrent.futures import ThreadPoolExecutor
+import atexit
 import hashlib
 import pickle
 import os
+import threading
 from tqdm import tqdm
 
 from ..config import Config
@@ -16,6 +18,34 @@ from ..models import Page
 
 logger = logging.getLogger(__name__)
 
+# Modèle d'embeddings partagé par tous les jobs du processus (index FAISS propre à chaque job)
+_shared_model: Optional[SentenceTransformer] = None
+_shared_model_lock = threading.Lock()
+_shared_pool: Optional[Dict] = None
+
+
+def get_shared_model() -> SentenceTransformer:
+    """Retourne le modèle de sentence transformers, chargé une seule fois par processus"""
+    global _shared_model
+    with _shared_model_lock:
+        if _shared_model is None:
+            logger.info(f"Chargement du modèle d'embeddings: {Config.EMBEDDING_MODEL}")
+            _shared_model = SentenceTransformer(Config.EMBEDDING_MODEL)
+            logger.info("Modèle d'embeddings chargé avec succès")
+    return _shared_model
+
+
+def get_shared_pool() -> Dict:
+    """Retourne le pool de processus d'encodage (EMBEDDING_WORKERS), démarré une seule fois"""
+    global _shared_pool
+    model = get_shared_model()
+    with _shared_model_lock:
+        if _shared_pool is None:
+            logger.info(f"Démarrage du pool d'encodage: {Config.EMBEDDING_WORKERS} processus")
+            _shared_pool = model.start_multi_process_pool(['cpu'] * Config.EMBEDDING_WORKERS)
+            atexit.register(SentenceTransformer.stop_multi_process_pool, _shared_pool)
+    return _shared_pool
+
 
 class EmbeddingManager:
     """Gestionnaire des embeddings et de l'index FAISS"""
@@ -28,10 +58,8 @@ class EmbeddingManager:
         self.chunk_cache = {}     # Cache des embeddings par hash de contenu
         
     def initialize_model(self):
-        """Initialise le modèle de sentence transformers"""
-        logger.info(f"Chargement du modèle d'embeddings: {Config.EMBEDDING_MODEL}")
-        self.model = SentenceTransformer(Config.EMBEDDING_MODEL)
-        logger.info("Modèle d'embeddings chargé avec succès")
+        """Initialise le modèle de sentence transformers (partagé entre les jobs)"""
+        self.model = get_shared_model()
         
     def create_faiss_index(self, dimension: int = Config.EMBEDDING_DIMENSION):
         """Crée un index FAISS avec similarité cosinus"""
@@ -109,7 +137,8 @@ class EmbeddingManager:
         logger.info(f"Traitement de {len(pages)} pages")
         
         all_chunks = []
-        new_embeddings = []
+        chunk_hashes = []
+        pending_texts = {}  # Chunks absents du cache, encodés en lot après le découpage
         
         iterator = tqdm(pages, desc="Traitement des pages") if show_progress else pages
         
@@ -128,12 +157,8 @@ class EmbeddingManager:
                 chunk_hash = self.get_content_hash(chunk_text)
                 
                 # Vérifier le cache
-                if chunk_hash in self.chunk_cache:
-                    embedding = self.chunk_cache[chunk_hash]
-                else:
-                    # Calculer l'embedding
-                    embedding = self.model.encode([chunk_text])[0]
-                    self.chunk_cache[chunk_hash] = embedding
+                if chunk_hash not in self.chunk_cache:
+                    pending_texts[chunk_hash] = chunk_text
                     
                 # Ajouter aux données
                 chunk_metadata = {
@@ -147,10 +172,17 @@ class EmbeddingManager:
                 
                 self.chunk_metadata.append(chunk_metadata)
                 all_chunks.append(chunk_text)
-                new_embeddings.append(embedding)
+                chunk_hashes.append(chunk_hash)
                 page_chunk_indices.append(len(self.chunk_metadata) - 1)
                 
             self.url_to_chunks[page.url] = page_chunk_indices
+        
+        # Calculer les embeddings manquants en un seul passage
+        if pending_texts:
+            embeddings = self.encode_texts(list(pending_texts.values()))
+            self.chunk_cache.update(zip(pending_texts.keys(), embeddings))
+        
+        new_embeddings = [self.chunk_cache[chunk_hash] for chunk_hash in chunk_hashes]
             
         # Ajouter les embeddings à l'index FAISS
         if new_embeddings:
@@ -163,6 +195,14 @@ class EmbeddingManager:
         
         return self.url_to_chunks
     
+    def encode_texts(self, texts: List[str]) -> np.ndarray:
+        """Encode des textes par lots, répartis sur plusieurs processus si configuré"""
+        if Config.EMBEDDING_WORKERS > 1 and len(texts) >= Config.EMBEDDING_MULTIPROCESS_MIN_TEXTS:
+            return self.model.encode_multi_process(
+                texts, get_shared_pool(), batch_size=Config.EMBEDDING_BATCH_SIZE
+            )
+        return self.model.encode(texts, batch_size=Config.EMBEDDING_BATCH_SIZE)
+    
     def search_similar_chunks(self, query: str, k: int = 10) -> List[Tuple[int, float]]:
         """Recherche les chunks les plus similaires à une requête"""
         if not self.model or not self.index:
@@ -40,6 +40,15 @@ job_manager: Optional[JobManager] = None
 metrics_collector: Optional[MetricsCollector] = None
 
 
+async def check_redis(manager: JobManager):
+    """Vérifie que Redis est accessible (journalise l'erreur sans bloquer le démarrage)"""
+    try:
+        await manager.redis_client.ping()
+        logger.info("Connexion Redis OK")
+    except Exception as e:
+        logger.error(f"Erreur connexion Redis: {e} (assurez-vous que Redis est démarré : redis-server)")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Gestionnaire de cycle de vie de l'application"""
@@ -54,18 +63,24 @@ async def lifespan(app: FastAPI):
     os.makedirs(Config.MODELS_DIR, exist_ok=True)
     
     # Initialiser les services
-    job_manager = JobManager()
     metrics_collector = MetricsCollector()
+    job_manager = JobManager(metrics_collector=metrics_collector)
     
     # Démarrer le collecteur de métriques
     await metrics_collector.start()
     
+    # Vérification Redis en tâche de fond : le serveur accepte les requêtes sans l'attendre
+    redis_check = asyncio.create_task(check_redis(job_manager))
+    
     yield
     
     # Arrêt
     logger.info("Arrêt de l'application")
+    redis_check.cancel()
     if metrics_collector:
         await metrics_collector.stop()
+    if job_manager:
+        await job_manager.close()
 
 
 # Création de l'application FastAPI
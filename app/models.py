@@ -3,6 +3,7 @@
 from typing import List, Optional, Dict, Any, Union
 from pydantic import BaseModel, Field, validator
 from enum import Enum
+import msgspec
 
 
 class JobStatus(str, Enum):
@@ -117,4 +118,59 @@ class MetricsResponse(BaseModel):
     faiss_queries_per_sec: float
     memory_usage_mb: float
     active_jobs: int
-    total_embeddings: int 
\ No newline at end of file
+    total_embeddings: int 
+
+
+# Structures de stockage Redis (msgspec) : miroirs compacts des données
+# sérialisées en MessagePack sous les clés job:*:progress et result:*
+
+class JobRecord(msgspec.Struct):
+    """Progression d'un job stockée dans le hash job:{job_id}:progress
+    
+    Chaque champ du hash contient sa valeur encodée en MessagePack ; les
+    paramètres du job, immuables, sont stockés à part sous job:{job_id}:params.
+    """
+    job_id: str
+    status: str
+    progress: float = 0.0
+    eta_seconds: Optional[int] = None
+    memory_mb: float = 0.0
+    current_step: str = ""
+    error_message: Optional[str] = None
+    created_at: str = ""
+
+
+class AssignmentRecord(msgspec.Struct):
+    """Assignation stockée dans un résultat de job"""
+    keyword: str
+    url: str
+    score: float
+    chunk_position: Optional[int] = None
+    alternative_urls: List[str] = []
+    is_manual: bool = False
+
+
+class KeywordRecord(msgspec.Struct):
+    """Mot-clé orphelin stocké dans un résultat de job"""
+    keyword: str
+    volume: Optional[int] = None
+
+
+class CannibalAlertRecord(msgspec.Struct):
+    """Alerte de cannibalisation stockée dans un résultat de job"""
+    keyword: str
+    assigned_url: str
+    gsc_top_url: str
+    gsc_clicks: int
+    confidence_loss: float
+
+
+class JobResultRecord(msgspec.Struct):
+    """Résultat d'un job stocké sous result:{job_id}"""
+    job_id: str
+    assignments: List[AssignmentRecord]
+    orphans: List[KeywordRecord]
+    cannibals: List[CannibalAlertRecord]
+    stats: Dict[str, Any]
+    created_at: str
+    completed_at: Optional[str] = None
@@ -1,53 +1,239 @@
 """Service d'export pour générer les fichiers de résultats"""
 
 import os
+import asyncio
+import gzip
 import logging
-import pandas as pd
 from datetime import datetime
-from typing import List, Dict, Any
-import openpyxl
-from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
-from openpyxl.utils.dataframe import dataframe_to_rows
+from typing import List, Dict, Any, TYPE_CHECKING
+from jinja2 import Environment, DictLoader
 
 from ..config import Config
 from ..models import JobResult, Assignment, Keyword, CannibalAlert
 
+# pandas, numpy, xlsxwriter et orjson sont importés à la demande dans les méthodes
+# d'export : les process qui n'exportent rien ne paient pas leur chargement
+if TYPE_CHECKING:
+    import pandas as pd
+
 logger = logging.getLogger(__name__)
 
 
+# Template du rapport HTML, compilé une seule fois au chargement du module
+_REPORT_TPL = """<!DOCTYPE html>
+<html lang="fr">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Rapport Keyword-URL Matcher - {{ job_id }}</title>
+    <script src="https://cdn.tailwindcss.com"></script>
+    <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
+</head>
+<body class="bg-gray-50 text-gray-900">
+    <div class="container mx-auto px-4 py-8">
+        <header class="mb-8">
+            <h1 class="text-3xl font-bold text-gray-800 mb-2">
+                Rapport d'Assignation Keyword-URL
+            </h1>
+            <p class="text-gray-600">Job ID: {{ job_id }} | Généré le: {{ generated_at }}</p>
+        </header>
+        
+        <!-- Statistiques principales -->
+        <div class="grid grid-cols-1 md:grid-cols-4 gap-6 mb-8">
+            <div class="bg-white rounded-lg shadow-md p-6">
+                <h3 class="text-lg font-semibold text-gray-700 mb-2">Mots-clés assignés</h3>
+                <p class="text-3xl font-bold text-blue-600">{{ assigned_keywords }}</p>
+                <p class="text-sm text-gray-500">{{ '%.1f'|format(assignment_rate) }}% du total</p>
+            </div>
+            <div class="bg-white rounded-lg shadow-md p-6">
+                <h3 class="text-lg font-semibold text-gray-700 mb-2">Pages analysées</h3>
+                <p class="text-3xl font-bold text-green-600">{{ stats.get('total_pages', 0) }}</p>
+            </div>
+            <div class="bg-white rounded-lg shadow-md p-6">
+                <h3 class="text-lg font-semibold text-gray-700 mb-2">Mots-clés orphelins</h3>
+                <p class="text-3xl font-bold text-yellow-600">{{ stats.get('orphan_keywords', 0) }}</p>
+            </div>
+            <div class="bg-white rounded-lg shadow-md p-6">
+                <h3 class="text-lg font-semibold text-gray-700 mb-2">Cannibalisations</h3>
+                <p class="text-3xl font-bold text-red-600">{{ stats.get('cannibalization_alerts', 0) }}</p>
+            </div>
+        </div>
+        
+        <!-- Graphique de distribution -->
+        <div class="bg-white rounded-lg shadow-md p-6 mb-8">
+            <h3 class="text-xl font-semibold text-gray-800 mb-4">Distribution des Scores</h3>
+            <canvas id="scoreChart" width="400" height="200"></canvas>
+        </div>
+        
+        <!-- Top assignations -->
+        <div class="bg-white rounded-lg shadow-md p-6">
+            <h3 class="text-xl font-semibold text-gray-800 mb-4">Top 10 Assignations</h3>
+            <div class="overflow-x-auto">
+                <table class="min-w-full table-auto">
+                    <thead class="bg-gray-50">
+                        <tr>
+                            <th class="px-4 py-2 text-left">Mot-clé</th>
+                            <th class="px-4 py-2 text-left">URL</th>
+                            <th class="px-4 py-2 text-center">Score</th>
+                            <th class="px-4 py-2 text-center">Confiance</th>
+                        </tr>
+                    </thead>
+                    <tbody>
+                    {% for row in top %}
+                        <tr class="border-b">
+                            <td class="px-4 py-2 font-medium">{{ row.keyword }}</td>
+                            <td class="px-4 py-2 text-blue-600">
+                                <a href="{{ row.url }}" target="_blank" class="hover:underline">
+                                    {{ row.url_display }}
+                                </a>
+                            </td>
+                            <td class="px-4 py-2 text-center font-mono">{{ '%.3f'|format(row.score) }}</td>
+                            <td class="px-4 py-2 text-center">
+                                <span class="{{ row.confidence_class }} font-semibold">{{ row.confidence }}</span>
+                            </td>
+                        </tr>
+                    {% endfor %}
+                    </tbody>
+                </table>
+            </div>
+        </div>
+    </div>
+    
+    <script>
+        // Graphique de distribution des scores
+        const ctx = document.getElementById('scoreChart').getContext('2d');
+        
+        const scoreData = {
+            labels: ['0.0-0.2', '0.2-0.4', '0.4-0.6', '0.6-0.8', '0.8-1.0'],
+            datasets: [{
+                label: "Nombre d'assignations",
+                data: {{ hist | tojson }},
+                backgroundColor: [
+                    'rgba(239, 68, 68, 0.8)',
+                    'rgba(245, 158, 11, 0.8)',
+                    'rgba(59, 130, 246, 0.8)',
+                    'rgba(16, 185, 129, 0.8)',
+                    'rgba(34, 197, 94, 0.8)'
+                ],
+                borderWidth: 1
+            }]
+        };
+        
+        new Chart(ctx, {
+            type: 'bar',
+            data: scoreData,
+            options: {
+                responsive: true,
+                scales: {
+                    y: {
+                        beginAtZero: true
+                    }
+                }
+            }
+        });
+    </script>
+</body>
+</html>
+"""
+
+# Taille du buffer d'écriture des exports JSON/HTML (1 MiB)
+_WRITE_BUFFER_SIZE = 1 << 20
+
+# Tranches de score utilisées pour le graphique de distribution
+_SCORE_BINS = [0.0, 0.2, 0.4, 0.6, 0.8, 1.0]
+
+# Colonnes des onglets Excel
+_SUMMARY_COLUMNS = ['Metric', 'Value', 'Description']
+_ASSIGNMENTS_COLUMNS = [
+    'Keyword', 'URL', 'Score', 'Score (%)', 'Chunk Position',
+    'Alternative URL 1', 'Alternative URL 2', 'Alternative URL 3',
+    'Is Manual', 'Confidence Level'
+]
+_ORPHANS_COLUMNS = ['Keyword', 'Volume', 'Reason', 'Suggestions']
+_CANNIBALS_COLUMNS = [
+    'Keyword', 'Assigned URL', 'GSC Top URL', 'GSC Clicks', 'Confidence Loss',
+    'Confidence Loss (%)', 'Severity', 'Recommendation'
+]
+
+# Colonnes centrées dans les onglets de données (C, D, E, I, J)
+_CENTERED_COLUMNS = frozenset({2, 3, 4, 8, 9})
+
+# Niveaux de confiance par score minimal (ordre décroissant), en dessous : 'Très faible'
+_CONFIDENCE_LEVELS = [(0.8, 'Très élevé'), (0.6, 'Élevé'), (0.4, 'Moyen'), (0.2, 'Faible')]
+_LOWEST_CONFIDENCE_LEVEL = 'Très faible'
+
+# Classes CSS associées aux niveaux de confiance du rapport HTML
+_CONFIDENCE_CLASSES = {
+    'Très élevé': 'text-green-600',
+    'Élevé': 'text-blue-600',
+    'Moyen': 'text-yellow-600',
+    'Faible': 'text-orange-600',
+    'Très faible': 'text-red-600'
+}
+
+_ORPHAN_REASON = 'Score trop bas ou aucune page pertinente trouvée'
+_ORPHAN_SUGGESTION = 'Créer du contenu spécifique ou optimiser les pages existantes'
+
+
+def _make_interner():
+    """Retourne une fonction qui renvoie toujours la même instance pour des chaînes égales"""
+    cache = {}
+    return lambda value: cache.setdefault(value, value)
+
+
+_env = Environment(loader=DictLoader({'report.html': _REPORT_TPL}), autoescape=True)
+_REPORT_TEMPLATE = _env.get_template('report.html')
+
+
 class ExportService:
     """Service pour exporter les résultats vers différents formats"""
     
     def __init__(self):
         # Créer le dossier de résultats s'il n'existe pas
         os.makedirs(Config.RESULTS_DIR, exist_ok=True)
-    
+
     async def export_to_xlsx(self, result: JobResult, job_id: str) -> str:
         """Exporte les résultats vers un fichier Excel formaté"""
+        return await asyncio.to_thread(self._export_xlsx_sync, result, job_id)
+    
+    def _export_xlsx_sync(self, result: JobResult, job_id: str) -> str:
+        """Génère le fichier Excel (bloquant, exécuté dans un thread)"""
+        import xlsxwriter
+        
         try:
             filename = f"keyword_matching_{job_id}.xlsx"
             filepath = os.path.join(Config.RESULTS_DIR, filename)
             
-            # Créer un workbook avec plusieurs onglets
-            with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
-                # Onglet Summary
-                summary_df = self._create_summary_dataframe(result)
-                summary_df.to_excel(writer, sheet_name='Summary', index=False)
-                
-                # Onglet Assignments
-                assignments_df = self._create_assignments_dataframe(result.assignments)
-                assignments_df.to_excel(writer, sheet_name='Assignments', index=False)
-                
-                # Onglet Orphans
-                orphans_df = self._create_orphans_dataframe(result.orphans)
-                orphans_df.to_excel(writer, sheet_name='Orphans', index=False)
-                
-                # Onglet Cannibalization
-                cannibals_df = self._create_cannibals_dataframe(result.cannibals)
-                cannibals_df.to_excel(writer, sheet_name='Cannibalization', index=False)
+            # Par défaut xlsxwriter déduplique les chaînes (URLs répétées) dans la table
+            # sharedStrings ; pour les très gros exports, on passe en mémoire constante
+            # (XML émis ligne par ligne, chaînes inline)
+            total_rows = len(result.assignments) + len(result.orphans) + len(result.cannibals)
+            workbook = xlsxwriter.Workbook(filepath, {
+                'constant_memory': total_rows > Config.EXCEL_CONSTANT_MEMORY_ROW_LIMIT,
+                'strings_to_urls': False,
+                'strings_to_formulas': False
+            })
+            formats = self._create_excel_formats(workbook)
+            
+            # Onglet Summary
+            summary_rows = self._get_summary_rows(result)
+            self._write_sheet(workbook, formats, 'Summary', _SUMMARY_COLUMNS, summary_rows, len(summary_rows))
+            
+            # Onglet Assignments
+            assignments_df = self._create_assignments_dataframe(result.assignments)
+            self._write_sheet(workbook, formats, 'Assignments', list(assignments_df.columns),
+                              self._dataframe_rows(assignments_df), len(assignments_df))
+            
+            # Onglet Orphans
+            self._write_sheet(workbook, formats, 'Orphans', _ORPHANS_COLUMNS,
+                              self._get_orphan_rows(result.orphans), len(result.orphans))
             
-            # Appliquer le formatage Excel
-            self._format_excel_file(filepath)
+            # Onglet Cannibalization
+            cannibals_df = self._create_cannibals_dataframe(result.cannibals)
+            self._write_sheet(workbook, formats, 'Cannibalization', list(cannibals_df.columns),
+                              self._dataframe_rows(cannibals_df), len(cannibals_df))
+            
+            workbook.close()
             
             logger.info(f"Export Excel créé: {filepath}")
             return filepath
@@ -58,6 +244,12 @@ class ExportService:
     
     async def export_to_csv(self, result: JobResult, job_id: str) -> str:
         """Exporte les résultats vers un fichier CSV"""
+        return await asyncio.to_thread(self._export_csv_sync, result, job_id)
+    
+    def _export_csv_sync(self, result: JobResult, job_id: str) -> str:
+        """Génère le fichier CSV (bloquant, exécuté dans un thread)"""
+        import pandas as pd
+        
         try:
             filename = f"keyword_matching_{job_id}.csv"
             filepath = os.path.join(Config.RESULTS_DIR, filename)
@@ -115,85 +307,90 @@ class ExportService:
             logger.error(f"Erreur export CSV: {e}")
             raise
     
-    def _create_summary_dataframe(self, result: JobResult) -> pd.DataFrame:
-        """Crée le DataFrame de résumé"""
-        summary_data = [
-            ['Metric', 'Value', 'Description'],
-            ['Total Keywords', result.stats.get('total_keywords', 0), 'Nombre total de mots-clés traités'],
-            ['Assigned Keywords', result.stats.get('assigned_keywords', 0), 'Mots-clés assignés avec succès'],
-            ['Orphan Keywords', result.stats.get('orphan_keywords', 0), 'Mots-clés sans assignation'],
-            ['Total Pages', result.stats.get('total_pages', 0), 'Nombre total de pages analysées'],
-            ['Processing Time', f"{result.stats.get('processing_time_seconds', 0):.2f}s", 'Temps de traitement total'],
-            ['Average Score', f"{result.stats.get('average_score', 0):.3f}", 'Score moyen des assignations'],
-            ['Cannibalization Alerts', result.stats.get('cannibalization_alerts', 0), 'Alertes de cannibalisation détectées'],
-            ['Assignment Rate', f"{(result.stats.get('assigned_keywords', 0) / max(result.stats.get('total_keywords', 1), 1) * 100):.1f}%", 'Taux d\'assignation'],
-            ['Created At', result.created_at, 'Date de création du job'],
-            ['Completed At', result.completed_at or 'N/A', 'Date de completion du job']
+    def _get_summary_rows(self, result: JobResult) -> List[tuple]:
+        """Construit les lignes de l'onglet de résumé"""
+        return [
+            ('Total Keywords', result.stats.get('total_keywords', 0), 'Nombre total de mots-clés traités'),
+            ('Assigned Keywords', result.stats.get('assigned_keywords', 0), 'Mots-clés assignés avec succès'),
+            ('Orphan Keywords', result.stats.get('orphan_keywords', 0), 'Mots-clés sans assignation'),
+            ('Total Pages', result.stats.get('total_pages', 0), 'Nombre total de pages analysées'),
+            ('Processing Time', f"{result.stats.get('processing_time_seconds', 0):.2f}s", 'Temps de traitement total'),
+            ('Average Score', f"{result.stats.get('average_score', 0):.3f}", 'Score moyen des assignations'),
+            ('Cannibalization Alerts', result.stats.get('cannibalization_alerts', 0), 'Alertes de cannibalisation détectées'),
+            ('Assignment Rate', f"{(result.stats.get('assigned_keywords', 0) / max(result.stats.get('total_keywords', 1), 1) * 100):.1f}%", 'Taux d\'assignation'),
+            ('Created At', result.created_at, 'Date de création du job'),
+            ('Completed At', result.completed_at or 'N/A', 'Date de completion du job')
         ]
-        
-        return pd.DataFrame(summary_data[1:], columns=summary_data[0])
     
-    def _create_assignments_dataframe(self, assignments: List[Assignment]) -> pd.DataFrame:
+    def _create_assignments_dataframe(self, assignments: List[Assignment]) -> 'pd.DataFrame':
         """Crée le DataFrame des assignations"""
-        data = []
-        for assignment in assignments:
-            data.append({
-                'Keyword': assignment.keyword,
-                'URL': assignment.url,
-                'Score': round(assignment.score, 4),
-                'Score (%)': f"{assignment.score * 100:.1f}%",
-                'Chunk Position': assignment.chunk_position,
-                'Alternative URL 1': assignment.alternative_urls[0] if len(assignment.alternative_urls) > 0 else '',
-                'Alternative URL 2': assignment.alternative_urls[1] if len(assignment.alternative_urls) > 1 else '',
-                'Alternative URL 3': assignment.alternative_urls[2] if len(assignment.alternative_urls) > 2 else '',
-                'Is Manual': assignment.is_manual,
-                'Confidence Level': self._get_confidence_level(assignment.score)
-            })
+        import numpy as np
+        import pandas as pd
         
-        return pd.DataFrame(data)
-    
-    def _create_orphans_dataframe(self, orphans: List[Keyword]) -> pd.DataFrame:
-        """Crée le DataFrame des mots-clés orphelins"""
-        data = []
-        for orphan in orphans:
-            data.append({
-                'Keyword': orphan.keyword,
-                'Volume': orphan.volume if orphan.volume else 'N/A',
-                'Reason': 'Score trop bas ou aucune page pertinente trouvée',
-                'Suggestions': 'Créer du contenu spécifique ou optimiser les pages existantes'
-            })
+        # Scores formatés en une passe vectorisée plutôt que ligne par ligne
+        scores = np.fromiter((a.score for a in assignments), dtype=np.float64, count=len(assignments))
+        score_pct = np.char.add(np.char.mod('%.1f', scores * 100).astype(str), '%')
+        confidence = np.select(
+            [scores >= threshold for threshold, _ in _CONFIDENCE_LEVELS],
+            [level for _, level in _CONFIDENCE_LEVELS],
+            default=_LOWEST_CONFIDENCE_LEVEL
+        )
+        
+        # URLs très répétées : une seule instance de chaque chaîne
+        intern = _make_interner()
         
-        return pd.DataFrame(data)
+        # Alternatives complétées une seule fois à 3 colonnes
+        alternatives = [[intern(url) for url in (a.alternative_urls + ['', '', ''])[:3]] for a in assignments]
+        alt_1, alt_2, alt_3 = zip(*alternatives) if alternatives else ((), (), ())
+        
+        return pd.DataFrame({
+            'Keyword': [a.keyword for a in assignments],
+            'URL': [intern(a.url) for a in assignments],
+            'Score': np.round(scores, 4),
+            'Score (%)': score_pct,
+            'Chunk Position': pd.Series([a.chunk_position for a in assignments], dtype=object),
+            'Alternative URL 1': alt_1,
+            'Alternative URL 2': alt_2,
+            'Alternative URL 3': alt_3,
+            'Is Manual': np.fromiter((a.is_manual for a in assignments), dtype=bool, count=len(assignments)),
+            'Confidence Level': confidence
+        }, columns=_ASSIGNMENTS_COLUMNS)
+    
+    def _get_orphan_rows(self, orphans: List[Keyword]) -> List[tuple]:
+        """Construit les lignes de l'onglet des mots-clés orphelins"""
+        # Raison et suggestion identiques pour tous les orphelins : mêmes objets réutilisés
+        return [
+            (orphan.keyword, orphan.volume if orphan.volume else 'N/A', _ORPHAN_REASON, _ORPHAN_SUGGESTION)
+            for orphan in orphans
+        ]
     
-    def _create_cannibals_dataframe(self, cannibals: List[CannibalAlert]) -> pd.DataFrame:
+    def _create_cannibals_dataframe(self, cannibals: List[CannibalAlert]) -> 'pd.DataFrame':
         """Crée le DataFrame des alertes de cannibalisation"""
-        data = []
-        for cannibal in cannibals:
-            data.append({
-                'Keyword': cannibal.keyword,
-                'Assigned URL': cannibal.assigned_url,
-                'GSC Top URL': cannibal.gsc_top_url,
-                'GSC Clicks': cannibal.gsc_clicks,
-                'Confidence Loss': f"{cannibal.confidence_loss:.2f}",
-                'Confidence Loss (%)': f"{cannibal.confidence_loss * 100:.1f}%",
-                'Severity': self._get_cannibalization_severity(cannibal.confidence_loss),
-                'Recommendation': self._get_cannibalization_recommendation(cannibal.confidence_loss)
-            })
+        import pandas as pd
         
-        return pd.DataFrame(data)
+        intern = _make_interner()
+        records = (
+            (
+                cannibal.keyword,
+                intern(cannibal.assigned_url),
+                intern(cannibal.gsc_top_url),
+                cannibal.gsc_clicks,
+                f"{cannibal.confidence_loss:.2f}",
+                f"{cannibal.confidence_loss * 100:.1f}%",
+                self._get_cannibalization_severity(cannibal.confidence_loss),
+                self._get_cannibalization_recommendation(cannibal.confidence_loss)
+            )
+            for cannibal in cannibals
+        )
+        
+        return pd.DataFrame.from_records(records, columns=_CANNIBALS_COLUMNS)
     
     def _get_confidence_level(self, score: float) -> str:
         """Détermine le niveau de confiance basé sur le score"""
-        if score >= 0.8:
-            return 'Très élevé'
-        elif score >= 0.6:
-            return 'Élevé'
-        elif score >= 0.4:
-            return 'Moyen'
-        elif score >= 0.2:
-            return 'Faible'
-        else:
-            return 'Très faible'
+        for threshold, level in _CONFIDENCE_LEVELS:
+            if score >= threshold:
+                return level
+        return _LOWEST_CONFIDENCE_LEVEL
     
     def _get_cannibalization_severity(self, confidence_loss: float) -> str:
         """Détermine la sévérité de la cannibalisation"""
@@ -217,69 +414,67 @@ class ExportService:
         else:
             return 'Impact minimal - Surveillance recommandée'
     
-    def _format_excel_file(self, filepath: str):
-        """Applique le formatage à un fichier Excel"""
-        try:
-            workbook = openpyxl.load_workbook(filepath)
-            
-            # Styles de formatage
-            header_font = Font(bold=True, color='FFFFFF')
-            header_fill = PatternFill(start_color='366092', end_color='366092', fill_type='solid')
-            border = Border(
-                left=Side(style='thin'),
-                right=Side(style='thin'),
-                top=Side(style='thin'),
-                bottom=Side(style='thin')
-            )
-            center_alignment = Alignment(horizontal='center', vertical='center')
-            
-            # Formater chaque feuille
-            for sheet_name in workbook.sheetnames:
-                worksheet = workbook[sheet_name]
-                
-                # Formatage des en-têtes
-                for cell in worksheet[1]:
-                    cell.font = header_font
-                    cell.fill = header_fill
-                    cell.border = border
-                    cell.alignment = center_alignment
-                
-                # Formatage des données
-                for row in worksheet.iter_rows(min_row=2):
-                    for cell in row:
-                        cell.border = border
-                        
-                        # Centrer certaines colonnes
-                        if cell.column_letter in ['C', 'D', 'E', 'I', 'J']:
-                            cell.alignment = center_alignment
-                
-                # Ajuster la largeur des colonnes
-                for column in worksheet.columns:
-                    max_length = 0
-                    column_letter = column[0].column_letter
-                    
-                    for cell in column:
-                        try:
-                            if len(str(cell.value)) > max_length:
-                                max_length = len(str(cell.value))
-                        except:
-                            pass
-                    
-                    adjusted_width = min(max_length + 2, 50)
-                    worksheet.column_dimensions[column_letter].width = adjusted_width
-                
-                # Figer la première ligne
-                worksheet.freeze_panes = 'A2'
-            
-            # Sauvegarder
-            workbook.save(filepath)
-            logger.info(f"Formatage Excel appliqué: {filepath}")
+    def _dataframe_rows(self, df: 'pd.DataFrame'):
+        """Itère les lignes d'un DataFrame en tuples, les valeurs manquantes devenant des cellules vides"""
+        return df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+    
+    def _create_excel_formats(self, workbook) -> Dict[str, Any]:
+        """Crée les formats partagés du workbook, référencés ensuite par toutes les cellules"""
+        return {
+            'header': workbook.add_format({
+                'bold': True,
+                'font_color': '#FFFFFF',
+                'bg_color': '#366092',
+                'border': 1,
+                'align': 'center',
+                'valign': 'vcenter'
+            }),
+            'centered': workbook.add_format({'align': 'center', 'valign': 'vcenter'})
+        }
+    
+    def _write_sheet(self, workbook, formats: Dict[str, Any], title: str, headers: List[str],
+                     rows, row_count: int):
+        """Écrit un onglet formaté, ligne par ligne
+        
+        Seuls les en-têtes portent une bordure. Jusqu'à EXCEL_FULL_FORMAT_ROW_LIMIT
+        lignes, les colonnes de données concernées sont centrées (format de colonne)
+        et leur largeur est ajustée au contenu. Au-delà, seul l'en-tête est stylé et
+        la largeur est estimée depuis les en-têtes, sans parcourir les données.
+        """
+        worksheet = workbook.add_worksheet(title)
+        worksheet.freeze_panes(1, 0)
+        worksheet.write_row(0, 0, headers, formats['header'])
+        
+        if row_count > Config.EXCEL_FULL_FORMAT_ROW_LIMIT:
+            for row_idx, row in enumerate(rows, start=1):
+                worksheet.write_row(row_idx, 0, row)
             
-        except Exception as e:
-            logger.error(f"Erreur formatage Excel: {e}")
+            max_header_len = max((len(str(header)) for header in headers), default=0)
+            worksheet.set_column(0, len(headers) - 1, min(max_header_len * 1.5, 40))
+            return
+        
+        # Données écrites en flux, largeur maximale suivie au passage
+        widths = [len(str(header)) for header in headers]
+        for row_idx, row in enumerate(rows, start=1):
+            worksheet.write_row(row_idx, 0, row)
+            for col_idx, value in enumerate(row):
+                if value is not None:
+                    length = len(str(value))
+                    if length > widths[col_idx]:
+                        widths[col_idx] = length
+        
+        for col_idx, width in enumerate(widths):
+            column_format = formats['centered'] if col_idx in _CENTERED_COLUMNS else None
+            worksheet.set_column(col_idx, col_idx, min(width + 2, 50), column_format)
     
     async def export_to_json(self, result: JobResult, job_id: str) -> str:
         """Exporte les résultats vers un fichier JSON"""
+        return await asyncio.to_thread(self._export_json_sync, result, job_id)
+    
+    def _export_json_sync(self, result: JobResult, job_id: str) -> str:
+        """Génère le fichier JSON (bloquant, exécuté dans un thread)"""
+        import orjson
+        
         try:
             filename = f"keyword_matching_{job_id}.json"
             filepath = os.path.join(Config.RESULTS_DIR, filename)
@@ -294,10 +489,8 @@ class ExportService:
                 'job_id': job_id
             }
             
-            # Écrire le fichier JSON
-            import json
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(result_dict, f, indent=2, ensure_ascii=False)
+            # Écrire le fichier JSON (sérialisé en UTF-8 en une passe)
+            filepath = self._write_payload(filepath, orjson.dumps(result_dict, option=orjson.OPT_INDENT_2))
             
             logger.info(f"Export JSON créé: {filepath}")
             return filepath
@@ -306,8 +499,25 @@ class ExportService:
             logger.error(f"Erreur export JSON: {e}")
             raise
     
+    def _write_payload(self, filepath: str, payload: bytes) -> str:
+        """Écrit un export déjà encodé, compressé en gzip si activé, et retourne le chemin final"""
+        if Config.EXPORT_GZIP:
+            # Niveau 1 : ratio quasi identique au niveau 6 sur du JSON/HTML, débit bien supérieur
+            filepath = f"{filepath}.gz"
+            with gzip.open(filepath, 'wb', compresslevel=1) as f:
+                f.write(payload)
+        else:
+            with open(filepath, 'wb', buffering=_WRITE_BUFFER_SIZE) as f:
+                f.write(payload)
+        
+        return filepath
+    
     async def generate_html_report(self, result: JobResult, job_id: str) -> str:
         """Génère un rapport HTML interactif"""
+        return await asyncio.to_thread(self._generate_html_report_sync, result, job_id)
+    
+    def _generate_html_report_sync(self, result: JobResult, job_id: str) -> str:
+        """Génère le rapport HTML (bloquant, exécuté dans un thread)"""
         try:
             filename = f"keyword_matching_report_{job_id}.html"
             filepath = os.path.join(Config.RESULTS_DIR, filename)
@@ -315,8 +525,7 @@ class ExportService:
             # Template HTML simple
             html_content = self._generate_html_template(result, job_id)
             
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(html_content)
+            filepath = self._write_payload(filepath, html_content.encode('utf-8'))
             
             logger.info(f"Rapport HTML créé: {filepath}")
             return filepath
@@ -327,6 +536,7 @@ class ExportService:
     
     def _generate_html_template(self, result: JobResult, job_id: str) -> str:
         """Génère le template HTML pour le rapport"""
+        import numpy as np
         
         # Statistiques de base
         stats = result.stats
@@ -334,139 +544,36 @@ class ExportService:
         assigned_keywords = stats.get('assigned_keywords', 0)
         assignment_rate = (assigned_keywords / max(total_keywords, 1)) * 100
         
-        html = f"""
-        <!DOCTYPE html>
-        <html lang="fr">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>Rapport Keyword-URL Matcher - {job_id}</title>
-            <script src="https://cdn.tailwindcss.com"></script>
-            <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
-        </head>
-        <body class="bg-gray-50 text-gray-900">
-            <div class="container mx-auto px-4 py-8">
-                <header class="mb-8">
-                    <h1 class="text-3xl font-bold text-gray-800 mb-2">
-                        Rapport d'Assignation Keyword-URL
-                    </h1>
-                    <p class="text-gray-600">Job ID: {job_id} | Généré le: {datetime.now().strftime('%d/%m/%Y à %H:%M')}</p>
-                </header>
-                
-                <!-- Statistiques principales -->
-                <div class="grid grid-cols-1 md:grid-cols-4 gap-6 mb-8">
-                    <div class="bg-white rounded-lg shadow-md p-6">
-                        <h3 class="text-lg font-semibold text-gray-700 mb-2">Mots-clés assignés</h3>
-                        <p class="text-3xl font-bold text-blue-600">{assigned_keywords}</p>
-                        <p class="text-sm text-gray-500">{assignment_rate:.1f}% du total</p>
-                    </div>
-                    <div class="bg-white rounded-lg shadow-md p-6">
-                        <h3 class="text-lg font-semibold text-gray-700 mb-2">Pages analysées</h3>
-                        <p class="text-3xl font-bold text-green-600">{stats.get('total_pages', 0)}</p>
-                    </div>
-                    <div class="bg-white rounded-lg shadow-md p-6">
-                        <h3 class="text-lg font-semibold text-gray-700 mb-2">Mots-clés orphelins</h3>
-                        <p class="text-3xl font-bold text-yellow-600">{stats.get('orphan_keywords', 0)}</p>
-                    </div>
-                    <div class="bg-white rounded-lg shadow-md p-6">
-                        <h3 class="text-lg font-semibold text-gray-700 mb-2">Cannibalisations</h3>
-                        <p class="text-3xl font-bold text-red-600">{stats.get('cannibalization_alerts', 0)}</p>
-                    </div>
-                </div>
-                
-                <!-- Graphique de distribution -->
-                <div class="bg-white rounded-lg shadow-md p-6 mb-8">
-                    <h3 class="text-xl font-semibold text-gray-800 mb-4">Distribution des Scores</h3>
-                    <canvas id="scoreChart" width="400" height="200"></canvas>
-                </div>
-                
-                <!-- Top assignations -->
-                <div class="bg-white rounded-lg shadow-md p-6">
-                    <h3 class="text-xl font-semibold text-gray-800 mb-4">Top 10 Assignations</h3>
-                    <div class="overflow-x-auto">
-                        <table class="min-w-full table-auto">
-                            <thead class="bg-gray-50">
-                                <tr>
-                                    <th class="px-4 py-2 text-left">Mot-clé</th>
-                                    <th class="px-4 py-2 text-left">URL</th>
-                                    <th class="px-4 py-2 text-center">Score</th>
-                                    <th class="px-4 py-2 text-center">Confiance</th>
-                                </tr>
-                            </thead>
-                            <tbody>
-        """
-        
         # Top 10 assignations par score
         top_assignments = sorted(result.assignments, key=lambda x: x.score, reverse=True)[:10]
         
-        for assignment in top_assignments:
-            confidence = self._get_confidence_level(assignment.score)
-            confidence_class = {
-                'Très élevé': 'text-green-600',
-                'Élevé': 'text-blue-600', 
-                'Moyen': 'text-yellow-600',
-                'Faible': 'text-orange-600',
-                'Très faible': 'text-red-600'
-            }.get(confidence, 'text-gray-600')
-            
-            html += f"""
-                                <tr class="border-b">
-                                    <td class="px-4 py-2 font-medium">{assignment.keyword}</td>
-                                    <td class="px-4 py-2 text-blue-600">
-                                        <a href="{assignment.url}" target="_blank" class="hover:underline">
-                                            {assignment.url[:50]}{'...' if len(assignment.url) > 50 else ''}
-                                        </a>
-                                    </td>
-                                    <td class="px-4 py-2 text-center font-mono">{assignment.score:.3f}</td>
-                                    <td class="px-4 py-2 text-center">
-                                        <span class="{confidence_class} font-semibold">{confidence}</span>
-                                    </td>
-                                </tr>
-            """
+        top = [
+            self._build_report_row(assignment, self._get_confidence_level(assignment.score))
+            for assignment in top_assignments
+        ]
         
-        html += """
-                            </tbody>
-                        </table>
-                    </div>
-                </div>
-            </div>
-            
-            <script>
-                // Graphique de distribution des scores
-                const ctx = document.getElementById('scoreChart').getContext('2d');
-                
-                // Données pour le graphique (à remplacer par les vraies données)
-                const scoreData = {
-                    labels: ['0.0-0.2', '0.2-0.4', '0.4-0.6', '0.6-0.8', '0.8-1.0'],
-                    datasets: [{
-                        label: 'Nombre d\\'assignations',
-                        data: [0, 0, 0, 0, 0], // À calculer depuis les vraies données
-                        backgroundColor: [
-                            'rgba(239, 68, 68, 0.8)',
-                            'rgba(245, 158, 11, 0.8)',
-                            'rgba(59, 130, 246, 0.8)',
-                            'rgba(16, 185, 129, 0.8)',
-                            'rgba(34, 197, 94, 0.8)'
-                        ],
-                        borderWidth: 1
-                    }]
-                };
-                
-                new Chart(ctx, {
-                    type: 'bar',
-                    data: scoreData,
-                    options: {
-                        responsive: true,
-                        scales: {
-                            y: {
-                                beginAtZero: true
-                            }
-                        }
-                    }
-                });
-            </script>
-        </body>
-        </html>
-        """
+        # Distribution des scores par tranches de 0.2
+        scores = np.clip(np.fromiter((a.score for a in result.assignments), dtype=np.float64), 0.0, 1.0)
+        hist, _ = np.histogram(scores, bins=_SCORE_BINS)
         
-        return html 
\ No newline at end of file
+        return _REPORT_TEMPLATE.render(
+            job_id=job_id,
+            generated_at=datetime.now().strftime('%d/%m/%Y à %H:%M'),
+            stats=stats,
+            assigned_keywords=assigned_keywords,
+            assignment_rate=assignment_rate,
+            top=top,
+            hist=hist.tolist()
+        )
+    
+    def _build_report_row(self, assignment: Assignment, confidence: str) -> Dict[str, Any]:
+        """Prépare une ligne du tableau Top 10 (URL tronquée calculée une seule fois)"""
+        url = assignment.url
+        return {
+            'keyword': assignment.keyword,
+            'url': url,
+            'url_display': url if len(url) <= 50 else url[:50] + '...',
+            'score': assignment.score,
+            'confidence': confidence,
+            'confidence_class': _CONFIDENCE_CLASSES.get(confidence, 'text-gray-600')
+        }
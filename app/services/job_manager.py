@@ -1,21 +1,22 @@
 """Gestionnaire de jobs pour le traitement asynchrone"""
 
 import asyncio
+import csv
 import logging
-import json
-import pandas as pd
+import msgspec
+import pyarrow.csv as pa_csv
 import time
 import traceback
+from itertools import repeat
 from datetime import datetime
 from typing import Dict, List, Optional, Any
 from celery import Celery
-import redis
-import psutil
+import redis.asyncio as redis
 
 from ..config import Config
 from ..models import (
     JobProgress, JobResult, JobStatus, SourceType, 
-    Keyword, Assignment, CannibalAlert
+    Keyword, Assignment, CannibalAlert, JobRecord, JobResultRecord
 )
 from ..core.embeddings import EmbeddingManager
 from ..core.scoring import HybridScorer
@@ -24,9 +25,27 @@ from ..core.scoring_ultra_optimized import UltraOptimizedHybridScorer
 from ..core.scoring_final_optimized import FinalOptimizedScorer
 from ..core.parsers import PageLoader
 from .search_console import SearchConsoleService
+from .monitoring import MetricsCollector, process_memory_rss
 
 logger = logging.getLogger(__name__)
 
+# Sorted set indexant les identifiants de jobs par date de création (évite SCAN sur
+# tout le keyspace) ; les entrées plus anciennes que la rétention sont purgées
+JOBS_INDEX_KEY = "jobs:by_created"
+JOBS_INDEX_RETENTION = 86400
+
+# Mise à jour atomique de la progression, seulement si le job existe encore
+# (KEYS: progression, paramètres ; ARGV: champs et valeurs alternés)
+UPDATE_PROGRESS_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HSET', KEYS[1], unpack(ARGV))
+redis.call('EXPIRE', KEYS[1], 3600)
+redis.call('EXPIRE', KEYS[2], 3600)
+return 1
+"""
+
 # Configuration Celery
 celery_app = Celery(
     'keyword_matcher',
@@ -41,37 +60,75 @@ celery_app.conf.update(
     result_expires=3600,
     timezone='UTC',
     enable_utc=True,
+    # Jobs longs : un seul message réservé par worker (à lancer avec -Ofair)
+    # pour éviter qu'un job court attende derrière un matching en cours
+    task_acks_late=True,
+    worker_prefetch_multiplier=1,
 )
 
 
 class JobManager:
     """Gestionnaire principal des jobs de matching"""
     
-    def __init__(self):
+    def __init__(self, metrics_collector: Optional[MetricsCollector] = None):
         self.redis_client = redis.from_url(Config.REDIS_URL)
         self.active_jobs = {}
+        self.metrics_collector = metrics_collector
+        
+        # Sérialisation MessagePack des données stockées dans Redis
+        self._encoder = msgspec.msgpack.Encoder()
+        self._value_decoder = msgspec.msgpack.Decoder()
+        self._result_decoder = msgspec.msgpack.Decoder(JobResultRecord)
+        self._update_progress = self.redis_client.register_script(UPDATE_PROGRESS_SCRIPT)
+    
+    def _memory_mb(self) -> float:
+        """Mémoire RSS du processus en Mo (via le collecteur, qui met à jour sa jauge mémoire)"""
+        if self.metrics_collector:
+            return self.metrics_collector.memory_mb()
+        return process_memory_rss() / 1024 / 1024
+    
+    async def close(self):
+        """Ferme les connexions Redis"""
+        await self.redis_client.close()
+    
+    def _encode_fields(self, fields: Dict[str, Any]) -> Dict[str, bytes]:
+        """Encode chaque champ d'un hash de progression en MessagePack"""
+        return {name: self._encoder.encode(value) for name, value in fields.items()}
+    
+    def _decode_job(self, raw: Dict[bytes, bytes]) -> JobRecord:
+        """Reconstruit la progression d'un job depuis son hash Redis"""
+        fields = {name.decode(): self._value_decoder.decode(value) for name, value in raw.items()}
+        return msgspec.convert(fields, JobRecord)
+    
+    def _decode_result(self, raw: bytes) -> JobResultRecord:
+        """Décode le résultat d'un job (JSON accepté pour les entrées antérieures à MessagePack)"""
+        if raw[:1] == b'{':
+            return msgspec.json.decode(raw, type=JobResultRecord)
+        return self._result_decoder.decode(raw)
         
     async def create_job(self, job_id: str, params: Dict[str, Any]) -> bool:
         """Crée un nouveau job dans Redis"""
         try:
-            job_data = {
+            progress_fields = {
                 'job_id': job_id,
-                'status': JobStatus.PENDING,
+                'status': JobStatus.PENDING.value,
                 'progress': 0.0,
                 'eta_seconds': None,
                 'memory_mb': 0.0,
                 'current_step': 'Initialisation',
                 'error_message': None,
-                'created_at': datetime.utcnow().isoformat(),
-                'params': params
+                'created_at': datetime.utcnow().isoformat()
             }
             
-            # Stocker dans Redis
-            self.redis_client.setex(
-                f"job:{job_id}",
-                3600,  # Expire après 1 heure
-                json.dumps(job_data)
-            )
+            # Stocker dans Redis : paramètres immuables à part, progression en hash
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.setex(f"job:{job_id}:params", 3600, self._encoder.encode(params))  # Expire après 1 heure
+            pipe.hset(f"job:{job_id}:progress", mapping=self._encode_fields(progress_fields))
+            pipe.expire(f"job:{job_id}:progress", 3600)
+            now = time.time()
+            pipe.zadd(JOBS_INDEX_KEY, {job_id: now})
+            pipe.zremrangebyscore(JOBS_INDEX_KEY, '-inf', now - JOBS_INDEX_RETENTION)
+            await pipe.execute()
             
             logger.info(f"Job créé: {job_id}")
             return True
@@ -83,20 +140,20 @@ class JobManager:
     async def get_job_progress(self, job_id: str) -> Optional[JobProgress]:
         """Récupère la progression d'un job"""
         try:
-            job_data_str = self.redis_client.get(f"job:{job_id}")
-            if not job_data_str:
+            job_fields = await self.redis_client.hgetall(f"job:{job_id}:progress")
+            if not job_fields:
                 return None
             
-            job_data = json.loads(job_data_str)
+            job_data = self._decode_job(job_fields)
             
             return JobProgress(
-                job_id=job_data['job_id'],
-                status=JobStatus(job_data['status']),
-                progress=job_data['progress'],
-                eta_seconds=job_data.get('eta_seconds'),
-                memory_mb=job_data['memory_mb'],
-                current_step=job_data['current_step'],
-                error_message=job_data.get('error_message')
+                job_id=job_data.job_id,
+                status=JobStatus(job_data.status),
+                progress=job_data.progress,
+                eta_seconds=job_data.eta_seconds,
+                memory_mb=job_data.memory_mb,
+                current_step=job_data.current_step,
+                error_message=job_data.error_message
             )
             
         except Exception as e:
@@ -104,26 +161,20 @@ class JobManager:
             return None
     
     async def update_job_progress(self, job_id: str, **updates) -> bool:
-        """Met à jour la progression d'un job"""
+        """Met à jour la progression d'un job (HSET des seuls champs modifiés)"""
         try:
-            job_data_str = self.redis_client.get(f"job:{job_id}")
-            if not job_data_str:
-                return False
-            
-            job_data = json.loads(job_data_str)
-            job_data.update(updates)
-            
             # Mettre à jour la mémoire utilisée
-            process = psutil.Process()
-            job_data['memory_mb'] = process.memory_info().rss / 1024 / 1024
-            
-            self.redis_client.setex(
-                f"job:{job_id}",
-                3600,
-                json.dumps(job_data)
+            updates['memory_mb'] = self._memory_mb()
+            
+            # Écriture immédiate en un aller-retour : les étapes suivantes du job bloquent
+            # la boucle d'événements, une écriture différée ne serait visible qu'après elles
+            fields = self._encode_fields({'job_id': job_id, **updates})
+            updated = await self._update_progress(
+                keys=[f"job:{job_id}:progress", f"job:{job_id}:params"],
+                args=[item for field in fields.items() for item in field]
             )
             
-            return True
+            return bool(updated)
             
         except Exception as e:
             logger.error(f"Erreur mise à jour job {job_id}: {e}")
@@ -132,25 +183,26 @@ class JobManager:
     async def get_job_result(self, job_id: str) -> Optional[JobResult]:
         """Récupère le résultat d'un job terminé"""
         try:
-            result_data_str = self.redis_client.get(f"result:{job_id}")
+            result_data_str = await self.redis_client.get(f"result:{job_id}")
             if not result_data_str:
                 return None
             
-            result_data = json.loads(result_data_str)
+            result_data = self._decode_result(result_data_str)
             
-            # Reconstituer les objets
-            assignments = [Assignment(**a) for a in result_data['assignments']]
-            orphans = [Keyword(**k) for k in result_data['orphans']]
-            cannibals = [CannibalAlert(**c) for c in result_data['cannibals']]
+            # Reconstituer les objets sans revalidation : données issues de save_job_result,
+            # déjà typées par le décodeur msgspec
+            assignments = [Assignment.model_construct(**msgspec.structs.asdict(a)) for a in result_data.assignments]
+            orphans = [Keyword.model_construct(**msgspec.structs.asdict(k)) for k in result_data.orphans]
+            cannibals = [CannibalAlert.model_construct(**msgspec.structs.asdict(c)) for c in result_data.cannibals]
             
-            return JobResult(
-                job_id=result_data['job_id'],
+            return JobResult.model_construct(
+                job_id=result_data.job_id,
                 assignments=assignments,
                 orphans=orphans,
                 cannibals=cannibals,
-                stats=result_data['stats'],
-                created_at=result_data['created_at'],
-                completed_at=result_data.get('completed_at')
+                stats=result_data.stats,
+                created_at=result_data.created_at,
+                completed_at=result_data.completed_at
             )
             
         except Exception as e:
@@ -160,20 +212,13 @@ class JobManager:
     async def save_job_result(self, job_id: str, result: JobResult) -> bool:
         """Sauvegarde le résultat d'un job"""
         try:
-            result_data = {
-                'job_id': result.job_id,
-                'assignments': [a.dict() for a in result.assignments],
-                'orphans': [k.dict() for k in result.orphans],
-                'cannibals': [c.dict() for c in result.cannibals],
-                'stats': result.stats,
-                'created_at': result.created_at,
-                'completed_at': result.completed_at
-            }
+            # Une seule traversée pydantic-core (Rust) puis un seul encodage MessagePack
+            result_data = result.model_dump()
             
-            self.redis_client.setex(
+            await self.redis_client.setex(
                 f"result:{job_id}",
                 86400,  # Expire après 24 heures
-                json.dumps(result_data)
+                self._encoder.encode(result_data)
             )
             
             return True
@@ -185,12 +230,13 @@ class JobManager:
     async def cancel_job(self, job_id: str) -> bool:
         """Annule un job en cours"""
         try:
-            # Marquer le job comme annulé
-            await self.update_job_progress(
+            # Marquer le job comme annulé (job inconnu ou expiré : rien à annuler)
+            if not await self.update_job_progress(
                 job_id,
                 status=JobStatus.FAILED.value,
                 error_message="Job annulé par l'utilisateur"
-            )
+            ):
+                return False
             
             # Supprimer de la liste des jobs actifs si présent
             if job_id in self.active_jobs:
@@ -206,21 +252,46 @@ class JobManager:
         """Liste les jobs avec filtrage optionnel"""
         try:
             jobs = []
-            keys = self.redis_client.keys("job:*")
-            
-            for key in keys[:limit]:
-                job_data_str = self.redis_client.get(key)
-                if job_data_str:
-                    job_data = json.loads(job_data_str)
+            live_count = 0
+            start = 0
+            
+            # Index trié (plus récents d'abord) plutôt qu'un parcours de tout le keyspace,
+            # HGETALL groupés en pipeline, jusqu'à `limit` jobs encore présents
+            while live_count < limit:
+                job_ids = [job_id.decode() for job_id in
+                           await self.redis_client.zrevrange(JOBS_INDEX_KEY, start, start + limit - 1)]
+                if not job_ids:
+                    break
+                start += len(job_ids)
+                
+                pipe = self.redis_client.pipeline(transaction=False)
+                for job_id in job_ids:
+                    pipe.hgetall(f"job:{job_id}:progress")
+                values = await pipe.execute()
+                
+                # Retirer de l'index les jobs dont la progression a expiré
+                # (les rangs suivants se décalent d'autant)
+                expired_ids = [job_id for job_id, job_fields in zip(job_ids, values) if not job_fields]
+                if expired_ids:
+                    await self.redis_client.zrem(JOBS_INDEX_KEY, *expired_ids)
+                    start -= len(expired_ids)
+                
+                for job_fields in values:
+                    if not job_fields:
+                        continue
+                    if live_count >= limit:
+                        break
+                    live_count += 1
+                    job_data = self._decode_job(job_fields)
                     
                     # Filtrer par statut si spécifié
-                    if status is None or job_data['status'] == status.value:
+                    if status is None or job_data.status == status.value:
                         jobs.append({
-                            'job_id': job_data['job_id'],
-                            'status': job_data['status'],
-                            'progress': job_data['progress'],
-                            'created_at': job_data['created_at'],
-                            'current_step': job_data['current_step']
+                            'job_id': job_data.job_id,
+                            'status': job_data.status,
+                            'progress': job_data.progress,
+                            'created_at': job_data.created_at,
+                            'current_step': job_data.current_step
                         })
             
             # Trier par date de création (plus récent en premier)
@@ -236,17 +307,15 @@ class JobManager:
         """Exécute un job de matching en arrière-plan"""
         start_time = time.time()
         
+        # Jauge des jobs actifs mise à jour à l'entrée et à la sortie du traitement
+        if self.metrics_collector:
+            self.metrics_collector.record_job_started()
+        
         try:
+            # 1. Démarrage + chargement des mots-clés (5%) : une seule mise à jour
             await self.update_job_progress(
                 job_id,
                 status=JobStatus.PROCESSING.value,
-                current_step="Démarrage du traitement",
-                progress=0.0
-            )
-            
-            # 1. Charger les mots-clés (5%)
-            await self.update_job_progress(
-                job_id,
                 current_step="Chargement des mots-clés",
                 progress=5.0
             )
@@ -265,33 +334,21 @@ class JobManager:
             logger.info(f"Job {job_id}: {len(pages)} pages chargées")
             
             # 3. Créer les embeddings (25-75% - étape la plus longue)
+            # L'EmbeddingManager ne remonte pas de progression : une seule étape intermédiaire
             await self.update_job_progress(
                 job_id,
-                current_step="Préparation des embeddings",
+                current_step="Génération des embeddings en cours...",
                 progress=25.0
             )
             
             embedding_manager = EmbeddingManager()
-            
-            await self.update_job_progress(
-                job_id,
-                current_step="Génération des embeddings en cours...",
-                progress=45.0
-            )
-            
             url_to_chunks = embedding_manager.process_pages(pages, show_progress=False)
             
-            await self.update_job_progress(
-                job_id,
-                current_step="Embeddings créés",
-                progress=75.0
-            )
-            
-            # 4. Assignation avec scoring hybride OPTIMISÉ (85%)
+            # 4. Assignation avec scoring hybride OPTIMISÉ (75%)
             await self.update_job_progress(
                 job_id,
                 current_step="Assignation des mots-clés",
-                progress=85.0
+                progress=75.0
             )
             
             # Utiliser le scorer FINAL pour des performances maximales
@@ -352,41 +409,25 @@ class JobManager:
                 error_message=str(e),
                 current_step="Erreur de traitement"
             )
+        
+        finally:
+            if self.metrics_collector:
+                self.metrics_collector.record_job_finished()
     
     async def _load_keywords(self, keywords_path: str) -> List[Keyword]:
         """Charge les mots-clés depuis un fichier CSV"""
         try:
-            # Supprimer le BOM si présent
-            with open(keywords_path, 'r', encoding='utf-8-sig') as f:
-                content = f.read()
-            
-            with open(keywords_path, 'w', encoding='utf-8') as f:
-                f.write(content)
-            
-            # Essayer différents séparateurs
-            df = None
-            used_sep = None
-            
-            for sep in [',', ';', '\t', '|']:
-                try:
-                    test_df = pd.read_csv(keywords_path, sep=sep, nrows=1)
-                    if len(test_df.columns) > 1:
-                        df = pd.read_csv(keywords_path, sep=sep, quoting=1, skipinitialspace=True)
-                        used_sep = sep
-                        break
-                except:
-                    continue
-            
-            if df is None:
-                # Fallback avec séparateur par défaut
-                try:
-                    df = pd.read_csv(keywords_path, quoting=1, skipinitialspace=True)
-                    used_sep = ','
-                except:
-                    df = pd.read_csv(keywords_path)
-                    used_sep = ','
+            # Détecter le séparateur sur un échantillon plutôt que reparser le fichier par essai
+            used_sep = self._detect_csv_separator(keywords_path)
+            # Lecteur CSV Arrow multi-thread (le BOM éventuel est ignoré à la lecture)
+            table = pa_csv.read_csv(
+                keywords_path,
+                parse_options=pa_csv.ParseOptions(delimiter=used_sep)
+            )
+            columns = [name.strip() for name in table.column_names]
+            table = table.rename_columns(columns)
             
-            logger.info(f"CSV mots-clés chargé avec séparateur '{used_sep}', colonnes: {list(df.columns)}")
+            logger.info(f"CSV mots-clés chargé avec séparateur '{used_sep}', colonnes: {columns}")
             
             # Recherche flexible de la colonne keyword
             keyword_col = None
@@ -395,31 +436,32 @@ class JobManager:
             # Noms possibles pour la colonne keyword
             keyword_possibilities = ['keyword', 'Keyword', 'mot-clé', 'mot_clé', 'query', 'terme']
             for col_name in keyword_possibilities:
-                if col_name in df.columns:
+                if col_name in columns:
                     keyword_col = col_name
                     break
             
             if keyword_col is None:
-                available_cols = list(df.columns)
+                available_cols = columns
                 raise ValueError(f"Colonne keyword non trouvée. Colonnes disponibles: {available_cols}. "
                                f"Noms acceptés: {keyword_possibilities}")
             
             # Recherche flexible de la colonne volume
             volume_possibilities = ['volume', 'Volume', 'Search Volume', 'search_volume', 'vol']
             for col_name in volume_possibilities:
-                if col_name in df.columns:
+                if col_name in columns:
                     volume_col = col_name
                     break
             
             logger.info(f"Colonnes détectées - keyword: '{keyword_col}', volume: '{volume_col or 'non trouvée'}'")
             
-            keywords = []
-            for _, row in df.iterrows():
-                keyword = Keyword(
-                    keyword=row[keyword_col],
-                    volume=row.get(volume_col, None) if volume_col else None
-                )
-                keywords.append(keyword)
+            # Colonnes converties une fois en objets Python natifs (valeurs manquantes -> None)
+            keyword_values = table.column(keyword_col).to_pylist()
+            volume_values = table.column(volume_col).to_pylist() if volume_col else repeat(None)
+            
+            keywords = [
+                Keyword(keyword=keyword, volume=volume)
+                for keyword, volume in zip(keyword_values, volume_values)
+            ]
             
             logger.info(f"Chargé {len(keywords)} mots-clés depuis {keywords_path}")
             return keywords
@@ -428,6 +470,16 @@ class JobManager:
             logger.error(f"Erreur chargement keywords {keywords_path}: {e}")
             raise
     
+    def _detect_csv_separator(self, path: str) -> str:
+        """Détecte le séparateur d'un CSV sur ses 64 premiers Ko (',' par défaut)"""
+        with open(path, 'rb') as f:
+            sample = f.read(65536).decode('utf-8-sig', 'ignore')
+        
+        try:
+            return csv.Sniffer().sniff(sample, delimiters=',;\t|').delimiter
+        except csv.Error:
+            return ','
+    
     async def _load_pages(self, params: Dict[str, Any]) -> List:
         """Charge les pages selon le type de source"""
         try:
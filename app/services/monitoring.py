@@ -1,18 +1,51 @@
 """Service de monitoring et métriques avec Prometheus"""
 
 import asyncio
+import contextlib
 import logging
+import os
 import time
 import psutil
-from typing import Dict, Any, List
-from prometheus_client import Counter, Histogram, Gauge, start_http_server
-import redis
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, List, Optional
+from prometheus_client import (
+    Counter, Histogram, Gauge, CollectorRegistry, REGISTRY, multiprocess, start_http_server
+)
+import redis.asyncio as redis
 
 from ..config import Config
 from ..models import MetricsResponse
 
 logger = logging.getLogger(__name__)
 
+# Échantillons relus par l'API (santé, métriques courantes)
+_READ_SAMPLES = frozenset({
+    'keyword_matcher_keywords_processed_total',
+    'keyword_matcher_faiss_queries_total',
+    'keyword_matcher_active_jobs',
+    'keyword_matcher_embeddings_total',
+})
+
+# Période de rafraîchissement de la jauge mémoire en mode multiprocess
+_MEMORY_REFRESH_SECONDS = 15
+
+# Processus courant ouvert une seule fois, mémoire RSS (bytes) mise en cache ~1s
+_PROCESS: Optional[psutil.Process] = None
+_RSS_CACHE = (0, 0.0)
+
+
+def process_memory_rss() -> int:
+    """Mémoire RSS du processus courant en bytes (relue au plus une fois par seconde)"""
+    global _PROCESS, _RSS_CACHE
+    if _PROCESS is None or _PROCESS.pid != os.getpid():
+        _PROCESS = psutil.Process()
+        _RSS_CACHE = (0, 0.0)
+    
+    now = time.monotonic()
+    if now - _RSS_CACHE[1] > 1.0:
+        _RSS_CACHE = (_PROCESS.memory_info().rss, now)
+    return _RSS_CACHE[0]
+
 
 class MetricsCollector:
     """Collecteur de métriques pour monitoring Prometheus"""
@@ -35,19 +68,24 @@ class MetricsCollector:
             'Nombre total de requêtes FAISS'
         )
         
+        # Jauges sommées sur les processus vivants en mode multiprocess
+        # (ignoré en mono-processus)
         self.memory_usage = Gauge(
             'keyword_matcher_memory_usage_bytes',
-            'Utilisation mémoire en bytes'
+            'Utilisation mémoire en bytes',
+            multiprocess_mode='livesum'
         )
         
         self.active_jobs_gauge = Gauge(
             'keyword_matcher_active_jobs',
-            'Nombre de jobs actifs'
+            'Nombre de jobs actifs',
+            multiprocess_mode='livesum'
         )
         
         self.embeddings_total = Gauge(
             'keyword_matcher_embeddings_total',
-            'Nombre total d\'embeddings dans l\'index'
+            'Nombre total d\'embeddings dans l\'index',
+            multiprocess_mode='livesum'
         )
         
         self.assignment_scores = Histogram(
@@ -56,13 +94,28 @@ class MetricsCollector:
             buckets=[0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0]
         )
         
+        # Registre de lecture/exposition : agrégation des fichiers de tous les workers
+        # si PROMETHEUS_MULTIPROC_DIR est défini (gunicorn, run.py), registre global sinon
+        self.multiprocess = 'PROMETHEUS_MULTIPROC_DIR' in os.environ
+        if self.multiprocess:
+            self.registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(self.registry)
+        else:
+            self.registry = REGISTRY
+        
         # Redis client pour récupérer des métriques
         self.redis_client = redis.from_url(Config.REDIS_URL)
         
+        # Jauges mises à jour aux transitions (jobs) et à chaque mesure mémoire ; la mémoire
+        # est en plus relue au moment du scrape en mono-processus, et périodiquement par
+        # chaque worker en multiprocess (le scrape ne lit que les fichiers des workers)
+        if not self.multiprocess:
+            self.memory_usage.set_function(self._memory_rss)
+        
         # État interne
         self.start_time = time.time()
         self.metrics_server_started = False
-        self.update_task = None
+        self._memory_refresh_task = None
         
     async def start(self):
         """Démarre le collecteur de métriques"""
@@ -70,7 +123,7 @@ class MetricsCollector:
             # Démarrer le serveur Prometheus seulement si activé et pas déjà démarré
             if Config.ENABLE_PROMETHEUS and not self.metrics_server_started:
                 try:
-                    start_http_server(Config.PROMETHEUS_PORT)
+                    start_http_server(Config.PROMETHEUS_PORT, registry=self.registry)
                     self.metrics_server_started = True
                     logger.info(f"Serveur métriques Prometheus démarré sur le port {Config.PROMETHEUS_PORT}")
                 except OSError as e:
@@ -83,10 +136,10 @@ class MetricsCollector:
                 logger.info("Métriques Prometheus désactivées par configuration")
                 self.metrics_server_started = False
             
-            # Démarrer la tâche de mise à jour périodique
-            if not self.update_task or self.update_task.done():
-                self.update_task = asyncio.create_task(self._update_metrics_loop())
-                logger.info("Collecteur de métriques démarré")
+            if self.multiprocess and self._memory_refresh_task is None:
+                self._memory_refresh_task = asyncio.create_task(self._refresh_memory_gauge())
+            
+            logger.info("Collecteur de métriques démarré")
             
         except Exception as e:
             logger.error(f"Erreur démarrage collecteur métriques: {e}")
@@ -95,59 +148,52 @@ class MetricsCollector:
     
     async def stop(self):
         """Arrête le collecteur de métriques"""
-        if self.update_task:
-            self.update_task.cancel()
-            try:
-                await self.update_task
-            except asyncio.CancelledError:
-                pass
+        if self._memory_refresh_task is not None:
+            self._memory_refresh_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._memory_refresh_task
+            self._memory_refresh_task = None
+        
+        await self.redis_client.close()
+        
+        # Exclure ce processus des jauges « live » agrégées
+        if self.multiprocess:
+            multiprocess.mark_process_dead(os.getpid())
         
         logger.info("Collecteur de métriques arrêté")
     
-    async def _update_metrics_loop(self):
-        """Boucle de mise à jour des métriques"""
+    def _memory_rss(self) -> int:
+        """Mémoire RSS du processus en bytes, reportée sur la jauge mémoire"""
+        rss = process_memory_rss()
+        self.memory_usage.set(rss)
+        return rss
+    
+    async def _refresh_memory_gauge(self):
+        """Met à jour la jauge mémoire de ce worker à intervalle régulier (multiprocess)"""
         while True:
-            try:
-                await self._update_system_metrics()
-                await self._update_job_metrics()
-                await asyncio.sleep(30)  # Mise à jour toutes les 30 secondes
-                
-            except asyncio.CancelledError:
-                break
-            except Exception as e:
-                logger.error(f"Erreur mise à jour métriques: {e}")
-                await asyncio.sleep(60)  # Attendre plus longtemps en cas d'erreur
+            self._memory_rss()
+            await asyncio.sleep(_MEMORY_REFRESH_SECONDS)
     
-    async def _update_system_metrics(self):
-        """Met à jour les métriques système"""
-        try:
-            # Utilisation mémoire
-            process = psutil.Process()
-            memory_info = process.memory_info()
-            self.memory_usage.set(memory_info.rss)
-            
-        except Exception as e:
-            logger.error(f"Erreur mise à jour métriques système: {e}")
+    def memory_mb(self) -> float:
+        """Mémoire RSS du processus en Mo"""
+        return self._memory_rss() / 1024 / 1024
     
-    async def _update_job_metrics(self):
-        """Met à jour les métriques des jobs"""
-        try:
-            # Compter les jobs actifs
-            active_jobs = 0
-            job_keys = self.redis_client.keys("job:*")
-            
-            for key in job_keys:
-                job_data = self.redis_client.get(key)
-                if job_data:
-                    import json
-                    job_info = json.loads(job_data)
-                    if job_info.get('status') == 'processing':
-                        active_jobs += 1
-            
-            self.active_jobs_gauge.set(active_jobs)
-            
-        except Exception as e:
-            logger.error(f"Erreur mise à jour métriques jobs: {e}")
+    def record_job_started(self):
+        """Comptabilise un job entrant en traitement"""
+        self.active_jobs_gauge.inc()
+    
+    def record_job_finished(self):
+        """Comptabilise la fin (succès ou échec) d'un job en traitement"""
+        self.active_jobs_gauge.dec()
+    
+    def _read_samples(self) -> Dict[str, float]:
+        """Lit les valeurs courantes via le registre (agrégées entre processus en multiprocess)"""
+        values = {}
+        for metric in self.registry.collect():
+            for sample in metric.samples:
+                if sample.name in _READ_SAMPLES:
+                    values[sample.name] = values.get(sample.name, 0.0) + sample.value
+        return values
     
     def record_keywords_processed(self, count: int):
         """Enregistre le nombre de mots-clés traités"""
@@ -175,18 +221,18 @@ class MetricsCollector:
             # Calculer les taux par seconde
             uptime = time.time() - self.start_time
             
-            keywords_per_sec = self.keywords_processed._value._value / max(uptime, 1)
-            faiss_qps = self.faiss_queries._value._value / max(uptime, 1)
+            samples = self._read_samples()
+            keywords_per_sec = samples.get('keyword_matcher_keywords_processed_total', 0.0) / max(uptime, 1)
+            faiss_qps = samples.get('keyword_matcher_faiss_queries_total', 0.0) / max(uptime, 1)
             
             # Mémoire actuelle
-            process = psutil.Process()
-            memory_mb = process.memory_info().rss / 1024 / 1024
+            memory_mb = self.memory_mb()
             
             # Jobs actifs
-            active_jobs = int(self.active_jobs_gauge._value._value)
+            active_jobs = int(samples.get('keyword_matcher_active_jobs', 0))
             
             # Total embeddings
-            total_embeddings = int(self.embeddings_total._value._value)
+            total_embeddings = int(samples.get('keyword_matcher_embeddings_total', 0))
             
             return MetricsResponse(
                 keywords_processed_per_sec=keywords_per_sec,
@@ -206,20 +252,21 @@ class MetricsCollector:
                 total_embeddings=0
             )
     
-    def get_health_status(self) -> Dict[str, Any]:
+    async def get_health_status(self) -> Dict[str, Any]:
         """Retourne l'état de santé du service"""
         try:
             # Vérifier la connectivité Redis
-            redis_ok = self.redis_client.ping()
+            redis_ok = await self.redis_client.ping()
             
             # Vérifier l'utilisation mémoire
-            process = psutil.Process()
-            memory_mb = process.memory_info().rss / 1024 / 1024
+            memory_mb = self.memory_mb()
             memory_ok = memory_mb < 8192  # Limite à 8GB
             
             # Vérifier l'uptime
             uptime = time.time() - self.start_time
             
+            samples = self._read_samples()
+            
             # Statut global
             healthy = redis_ok and memory_ok
             
@@ -229,9 +276,9 @@ class MetricsCollector:
                 'redis_connected': redis_ok,
                 'memory_usage_mb': memory_mb,
                 'memory_ok': memory_ok,
-                'active_jobs': int(self.active_jobs_gauge._value._value),
-                'total_keywords_processed': int(self.keywords_processed._value._value),
-                'total_faiss_queries': int(self.faiss_queries._value._value),
+                'active_jobs': int(samples.get('keyword_matcher_active_jobs', 0)),
+                'total_keywords_processed': int(samples.get('keyword_matcher_keywords_processed_total', 0)),
+                'total_faiss_queries': int(samples.get('keyword_matcher_faiss_queries_total', 0)),
                 'prometheus_server_running': self.metrics_server_started
             }
             
@@ -249,48 +296,22 @@ class PerformanceMonitor:
     
     def __init__(self, metrics_collector: MetricsCollector):
         self.metrics_collector = metrics_collector
-        self.operation_timers = {}
     
-    def start_operation(self, operation_name: str) -> str:
-        """Démarre le chronométrage d'une opération"""
-        timer_id = f"{operation_name}_{int(time.time() * 1000)}"
-        self.operation_timers[timer_id] = {
-            'name': operation_name,
-            'start_time': time.time()
-        }
-        return timer_id
+    @contextmanager
+    def measure(self, operation_name: str) -> Iterator[None]:
+        """Chronomètre un bloc (perf_counter_ns) et enregistre la métrique, sans état partagé"""
+        start_ns = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            duration = (time.perf_counter_ns() - start_ns) / 1e9
+            self._record_duration(operation_name, duration)
+            logger.debug(f"Opération {operation_name} terminée en {duration:.2f}s")
     
-    def end_operation(self, timer_id: str) -> float:
-        """Termine le chronométrage et enregistre la métrique"""
-        if timer_id not in self.operation_timers:
-            logger.warning(f"Timer {timer_id} non trouvé")
-            return 0.0
-        
-        timer_info = self.operation_timers[timer_id]
-        duration = time.time() - timer_info['start_time']
-        
-        # Enregistrer selon le type d'opération
-        if timer_info['name'] == 'job_processing':
+    def _record_duration(self, operation_name: str, duration: float):
+        """Enregistre une durée selon le type d'opération"""
+        if operation_name == 'job_processing':
             self.metrics_collector.record_processing_time(duration)
-        
-        del self.operation_timers[timer_id]
-        
-        logger.debug(f"Opération {timer_info['name']} terminée en {duration:.2f}s")
-        return duration
-    
-    def get_active_operations(self) -> Dict[str, Dict[str, Any]]:
-        """Retourne les opérations en cours"""
-        active_ops = {}
-        current_time = time.time()
-        
-        for timer_id, timer_info in self.operation_timers.items():
-            active_ops[timer_id] = {
-                'name': timer_info['name'],
-                'duration': current_time - timer_info['start_time'],
-                'start_time': timer_info['start_time']
-            }
-        
-        return active_ops
 
 
 class AlertManager:
@@ -311,9 +332,8 @@ class AlertManager:
         alerts = []
         
         try:
-            # Vérification mémoire
-            process = psutil.Process()
-            memory_mb = process.memory_info().rss / 1024 / 1024
+            # Vérification mémoire (mesure partagée avec le collecteur)
+            memory_mb = self.metrics_collector.memory_mb()
             
             if memory_mb > self.alert_thresholds['memory_mb']:
                 alert = {
@@ -1,13 +1,32 @@
 """Service Google Search Console pour l'authentification et l'analyse de cannibalisation"""
 
+import asyncio
+import contextlib
+import glob
+import hashlib
+import itertools
 import logging
-from typing import List, Dict, Optional
+import os
+import re
+import tempfile
+import threading
+import time
+import unicodedata
+from functools import lru_cache
+from typing import Any, Callable, List, Dict, NamedTuple, Optional, Set, Tuple
 from datetime import datetime, timedelta
 import json
 
+import httplib2
+import msgspec
+import orjson
+from cachetools import TTLCache
+import numpy as np
+from google_auth_httplib2 import AuthorizedHttp
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
 from googleapiclient.discovery import build
+from googleapiclient.model import JsonModel
 from google.auth.transport.requests import Request
 
 from ..config import Config
@@ -15,6 +34,138 @@ from ..models import Assignment, CannibalAlert
 
 logger = logging.getLogger(__name__)
 
+# Marge avant expiration du token déclenchant un rafraîchissement anticipé
+_REFRESH_MARGIN_SECONDS = 300
+
+# Normalisation des URLs : protocole, puis slashs finaux suivis éventuellement de ?... ou #...
+_URL_NORM_RE = re.compile(r'^https?://|/*(?:[?#].*)?$')
+
+# Espaces multiples dans les requêtes / mots-clés
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Durée de validité des snapshots disque des données Search Analytics
+_SNAPSHOT_MAX_AGE_SECONDS = 86400
+
+# Nombre maximal de lignes par requête Search Analytics
+_GSC_ROW_LIMIT = 25000
+# Nombre de sous-requêtes par requête batch
+_GSC_BATCH_SIZE = 50
+# Nombre de requêtes et longueur maximale (caractères) par filtre côté serveur
+_GSC_QUERY_FILTER_MAX = 100
+_GSC_QUERY_FILTER_MAX_CHARS = 4000
+# Au-delà de ce nombre de lots filtrés (chacun paginé et décompté du quota), récupérer
+# toutes les lignes plutôt que filtrer ; borné sur les lots et non sur le nombre de
+# requêtes, la longueur des motifs variant avec les classes d'accents
+_GSC_QUERY_FILTER_MAX_CHUNKS = 5
+
+# Statistiques GSC de la page top d'une requête (une ligne par requête)
+_TOP_PAGE_DTYPE = np.dtype([('clicks', 'i4'), ('impr', 'i4'), ('ctr', 'f4'), ('pos', 'f4')])
+
+# Page top par requête, par (propriété, période) : les données GSC évoluent
+# au plus une fois par jour, partagées entre les instances du service
+_TOP_PAGES_CACHE: TTLCache = TTLCache(maxsize=32, ttl=21600)
+
+# Clients API par empreinte de credentials, réutilisés entre les instances du service
+_SERVICE_CACHE: Dict[str, Any] = {}
+
+# Connexions autorisées par thread (httplib2 n'est pas thread-safe) et par empreinte de
+# credentials : la connexion TLS est réutilisée d'un appel à l'autre dans un même thread
+_THREAD_HTTP = threading.local()
+
+# Un seul rafraîchissement de token à la fois pour toutes les instances du service
+_REFRESH_LOCK = asyncio.Lock()
+
+# Références aux tâches de fond en cours (évite leur collecte avant la fin)
+_BACKGROUND_TASKS = set()
+
+# Credentials OAuth persistés (lecture/écriture réservées au propriétaire)
+_TOKEN_PATH = Config.GSC_TOKEN_PATH
+
+
+class _OrjsonModel(JsonModel):
+    """Modèle JSON du client API décodant les réponses avec orjson (réponses Search
+    Analytics de plusieurs Mo)"""
+    
+    def deserialize(self, content):
+        try:
+            body = orjson.loads(content)
+        except orjson.JSONDecodeError:
+            return content.decode('utf-8') if isinstance(content, bytes) else content
+        if self._data_wrapper and isinstance(body, dict) and 'data' in body:
+            body = body['data']
+        return body
+
+
+@lru_cache(maxsize=1)
+def _accent_classes() -> Dict[str, str]:
+    """Classe regex de chaque lettre latine avec ses variantes accentuées, c.-à-d. les
+    caractères de même forme canonique (la casse est gérée par (?i))"""
+    variants: Dict[str, List[str]] = {}
+    for codepoint in itertools.chain(range(0x00C0, 0x0250), range(0x1E00, 0x1F00)):
+        char = chr(codepoint)
+        base = SearchConsoleService._canonical_query(char)
+        if len(base) == 1 and base.isascii() and base.isalpha() and char != base and char == char.lower():
+            variants.setdefault(base, [base]).append(char)
+    return {base: '[' + ''.join(chars) + ']' for base, chars in variants.items()}
+
+
+def _read_snapshot_frame(f) -> Optional[bytes]:
+    """Lit le lot suivant d'un snapshot (None en fin de fichier)"""
+    header = f.read(4)
+    if not header:
+        return None
+    size = int.from_bytes(header, 'big')
+    frame = f.read(size)
+    if len(header) < 4 or len(frame) < size:
+        raise msgspec.DecodeError("Snapshot tronqué")
+    return frame
+
+
+class _SnapshotWriter:
+    """Écriture incrémentale d'un snapshot : lots de lignes MessagePack préfixés par leur
+    taille, dans un fichier temporaire renommé à la fin (écriture atomique)"""
+    
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        # Nom unique : deux workers peuvent écrire le même snapshot en même temps
+        fd, self.tmp_path = tempfile.mkstemp(dir=os.path.dirname(path),
+                                             prefix=f"{os.path.basename(path)}.", suffix=".tmp")
+        self._file = os.fdopen(fd, 'wb')
+        self._buffer: List[Dict] = []
+    
+    def add(self, item: Dict):
+        """Ajoute une ligne, écrite par lots de la taille d'une page"""
+        self._buffer.append(item)
+        if len(self._buffer) >= _GSC_ROW_LIMIT:
+            self._write_frame()
+    
+    def _write_frame(self):
+        if self._buffer:
+            frame = msgspec.msgpack.encode(self._buffer)
+            self._file.write(len(frame).to_bytes(4, 'big'))
+            self._file.write(frame)
+            self._buffer = []
+    
+    def commit(self):
+        """Écrit le dernier lot et publie le snapshot"""
+        self._write_frame()
+        self._file.close()
+        os.replace(self.tmp_path, self.path)
+    
+    def abort(self):
+        """Abandonne le snapshot en cours (fichier temporaire supprimé)"""
+        self._file.close()
+        with contextlib.suppress(OSError):
+            os.remove(self.tmp_path)
+
+
+class _TopPages(NamedTuple):
+    """Page top par requête en colonnes : index requête -> ligne, statistiques et URLs alignées"""
+    index: Dict[str, int]
+    stats: np.ndarray
+    pages: np.ndarray
+
 
 class SearchConsoleService:
     """Service pour interagir avec Google Search Console API"""
@@ -24,6 +175,53 @@ class SearchConsoleService:
         self.service = None
         self.flow = None
         
+        # Reprendre une session existante plutôt que relancer le flow OAuth
+        # (rafraîchie au premier appel via refresh_credentials, hors boucle d'événements)
+        if self.load_credentials():
+            self.service = self._get_service()
+        
+    def _credentials_fingerprint(self) -> str:
+        """Empreinte stable des credentials (inchangée par un rafraîchissement du token)"""
+        return hashlib.sha256(
+            f"{self.credentials.client_id}:{self.credentials.refresh_token or self.credentials.token}".encode('utf-8')
+        ).hexdigest()
+    
+    def _get_service(self):
+        """Retourne le client API pour ces credentials, construit une seule fois par processus
+        
+        Document de découverte embarqué (pas de requête réseau). Le client mis en cache
+        est partagé entre threads : chaque appel passe donc `http=self._authorized_http()`,
+        la connexion du thread courant portant les credentials courants.
+        """
+        fingerprint = self._credentials_fingerprint()
+        service = _SERVICE_CACHE.get(fingerprint)
+        if service is None:
+            service = build('webmasters', 'v3', http=self._authorized_http(), model=_OrjsonModel(),
+                            cache_discovery=False, static_discovery=True)
+            _SERVICE_CACHE[fingerprint] = service
+        return service
+    
+    def load_credentials(self) -> bool:
+        """Charge les credentials persistés (utilisables tels quels ou rafraîchissables)"""
+        if not os.path.exists(_TOKEN_PATH):
+            return False
+        
+        try:
+            self.credentials = Credentials.from_authorized_user_file(_TOKEN_PATH)
+            return self.credentials.valid or bool(self.credentials.refresh_token)
+            
+        except Exception as e:
+            logger.error(f"Erreur chargement credentials {_TOKEN_PATH}: {e}")
+            self.credentials = None
+            return False
+    
+    def _save_credentials(self):
+        """Persiste les credentials (token, refresh_token, expiry) en 0600"""
+        os.makedirs(os.path.dirname(_TOKEN_PATH) or ".", exist_ok=True)
+        fd = os.open(_TOKEN_PATH, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(self.credentials.to_json())
+        
     def _get_oauth_flow(self) -> Flow:
         """Crée un flow OAuth pour Google Search Console"""
         if not Config.GOOGLE_CLIENT_ID or not Config.GOOGLE_CLIENT_SECRET:
@@ -75,13 +273,18 @@ class SearchConsoleService:
             # Échanger le code contre des tokens
             self.flow.fetch_token(code=code)
             self.credentials = self.flow.credentials
+            self._save_credentials()
             
             # Créer le service API
-            self.service = build('webmasters', 'v3', credentials=self.credentials)
+            self.service = self._get_service()
+            
+            logger.info("Authentification réussie")
             
-            # Tester la connexion
-            sites = self.service.sites().list().execute()
-            logger.info(f"Authentification réussie, {len(sites.get('siteEntry', []))} propriétés trouvées")
+            # Vérification de la connexion en mode debug uniquement, sans retarder le callback
+            if Config.DEBUG:
+                task = asyncio.create_task(self._log_properties_count())
+                _BACKGROUND_TASKS.add(task)
+                task.add_done_callback(_BACKGROUND_TASKS.discard)
             
             return True
             
@@ -89,13 +292,25 @@ class SearchConsoleService:
             logger.error(f"Erreur callback OAuth: {e}")
             return False
     
+    async def _log_properties_count(self):
+        """Teste la connexion en listant les propriétés (tâche de fond)"""
+        try:
+            sites = await asyncio.to_thread(self.service.sites().list().execute, http=self._authorized_http())
+            logger.info(f"Connexion Search Console vérifiée, {len(sites.get('siteEntry', []))} propriétés trouvées")
+        except Exception as e:
+            logger.error(f"Erreur vérification connexion Search Console: {e}")
+    
     async def get_properties(self) -> List[Dict[str, str]]:
         """Récupère la liste des propriétés Search Console"""
         try:
             if not self.service:
                 raise ValueError("Service non authentifié")
             
-            response = self.service.sites().list().execute()
+            await self.refresh_credentials()
+            
+            response = await asyncio.to_thread(
+                self.service.sites().list().execute, http=self._authorized_http()
+            )
             sites = response.get('siteEntry', [])
             
             properties = []
@@ -113,46 +328,41 @@ class SearchConsoleService:
     
     async def get_search_analytics_data(self, site_url: str, 
                                       start_date: Optional[datetime] = None,
-                                      end_date: Optional[datetime] = None) -> List[Dict]:
-        """Récupère les données Search Analytics"""
+                                      end_date: Optional[datetime] = None,
+                                      sink: Optional[Callable[[Dict], None]] = None,
+                                      queries: Optional[Set[str]] = None) -> List[Dict]:
+        """Récupère les données Search Analytics (toutes les pages de résultats)
+        
+        Si `sink` est fourni, chaque ligne lui est transmise au fil de la pagination
+        et aucune liste n'est construite (la valeur retournée est alors vide).
+        Si `queries` est fourni, seules les lignes de ces requêtes sont retournées
+        (comparaison sur la forme canonique : casse, accents et espaces ignorés).
+        """
         try:
             if not self.service:
                 raise ValueError("Service non authentifié")
             
-            # Dates par défaut : 90 derniers jours
-            if not end_date:
-                end_date = datetime.now()
-            if not start_date:
-                start_date = end_date - timedelta(days=90)
-            
-            request_body = {
-                'startDate': start_date.strftime('%Y-%m-%d'),
-                'endDate': end_date.strftime('%Y-%m-%d'),
-                'dimensions': ['query', 'page'],
-                'rowLimit': 25000  # Maximum autorisé
-            }
+            await self.refresh_credentials()
             
-            response = self.service.searchanalytics().query(
-                siteUrl=site_url,
-                body=request_body
-            ).execute()
+            request_body = self._build_request_body(start_date, end_date)
             
-            rows = response.get('rows', [])
-            logger.info(f"Récupéré {len(rows)} lignes de données Search Console")
-            
-            # Transformer les données
             data = []
-            for row in rows:
-                keys = row.get('keys', [])
-                if len(keys) >= 2:
-                    data.append({
-                        'query': keys[0],
-                        'page': keys[1],
-                        'clicks': row.get('clicks', 0),
-                        'impressions': row.get('impressions', 0),
-                        'ctr': row.get('ctr', 0),
-                        'position': row.get('position', 0)
-                    })
+            consume = sink or data.append
+            
+            if queries is None:
+                await self._fetch_search_analytics(site_url, request_body, consume)
+                return data
+            
+            queries = {self._canonical_query(query) for query in queries}
+            
+            def consume_matching(row: Dict):
+                if self._canonical_query(row['query']) in queries:
+                    consume(row)
+            
+            if await self._use_query_filter(site_url, request_body, queries):
+                await self._fetch_queries_search_analytics(site_url, request_body, queries, consume_matching)
+            else:
+                await self._fetch_search_analytics(site_url, request_body, consume_matching)
             
             return data
             
@@ -160,14 +370,328 @@ class SearchConsoleService:
             logger.error(f"Erreur récupération données Search Console: {e}")
             return []
     
+    async def get_search_analytics_multi(self, site_urls: List[str],
+                                         start_date: Optional[datetime] = None,
+                                         end_date: Optional[datetime] = None) -> Dict[str, List[Dict]]:
+        """Récupère les données Search Analytics de plusieurs propriétés
+        
+        Les premières pages sont regroupées dans des requêtes batch (une requête HTTP
+        multipart par lot de 50 propriétés) ; la pagination éventuelle suit par propriété.
+        """
+        try:
+            if not self.service:
+                raise ValueError("Service non authentifié")
+            
+            await self.refresh_credentials()
+            
+            request_body = self._build_request_body(start_date, end_date)
+            results = {}
+            
+            for i in range(0, len(site_urls), _GSC_BATCH_SIZE):
+                chunk = site_urls[i:i + _GSC_BATCH_SIZE]
+                first_pages = await asyncio.to_thread(
+                    self._fetch_first_pages_batch, [(site_url, request_body) for site_url in chunk]
+                )
+                
+                for site_url, rows in zip(chunk, first_pages):
+                    data = []
+                    total_rows = await self._consume_pages(site_url, request_body, rows, data.append)
+                    results[site_url] = data
+                    logger.info(f"Récupéré {total_rows} lignes de données Search Console pour {site_url}")
+            
+            return results
+            
+        except Exception as e:
+            logger.error(f"Erreur récupération données Search Console multi-propriétés: {e}")
+            return {}
+    
+    async def _fetch_search_analytics(self, site_url: str, request_body: Dict,
+                                      consume: Callable[[Dict], None]):
+        """Récupère toutes les pages d'une propriété (lève l'exception en cas d'échec)
+        
+        Les lignes sont relues depuis un snapshot disque de moins de 24h s'il existe,
+        sinon récupérées via l'API et enregistrées en snapshot au fil de la pagination.
+        """
+        snapshot_path = self._snapshot_path(site_url, request_body)
+        if await asyncio.to_thread(self._snapshot_is_fresh, snapshot_path):
+            total_rows = await self._replay_snapshot(snapshot_path, consume)
+            logger.info(f"Récupéré {total_rows} lignes de données Search Console (snapshot)")
+            return
+        
+        writer = None
+        try:
+            writer = await asyncio.to_thread(_SnapshotWriter, snapshot_path)
+        except OSError as e:
+            logger.error(f"Erreur écriture snapshot Search Console {snapshot_path}: {e}")
+        
+        def consume_and_write(item: Dict):
+            writer.add(item)
+            consume(item)
+        
+        try:
+            rows = await asyncio.to_thread(self._fetch_rows, site_url, request_body, 0)
+            total_rows = await self._consume_pages(
+                site_url, request_body, rows, consume_and_write if writer else consume
+            )
+        except BaseException:
+            if writer:
+                await asyncio.to_thread(writer.abort)
+            raise
+        
+        logger.info(f"Récupéré {total_rows} lignes de données Search Console")
+        
+        if writer:
+            try:
+                await asyncio.to_thread(writer.commit)
+                await asyncio.to_thread(self._purge_snapshots)
+            except OSError as e:
+                logger.error(f"Erreur écriture snapshot Search Console {snapshot_path}: {e}")
+    
+    async def _fetch_queries_search_analytics(self, site_url: str, request_body: Dict,
+                                              queries: Set[str], consume: Callable[[Dict], None]):
+        """Récupère uniquement les lignes des requêtes `queries` (lève l'exception en cas d'échec)
+        
+        `queries` sont des formes canoniques : le filtre côté serveur accepte aussi leurs
+        variantes (casse, accents, espaces), comme la comparaison faite sur les lignes
+        récupérées en entier. Il est découpé en lots de requêtes (nombre et longueur
+        d'expression bornés) ; les premières pages de chaque lot sont regroupées dans
+        une même requête batch.
+        """
+        chunks = self._query_filter_chunks(queries)
+        
+        bodies = [
+            {**request_body, 'dimensionFilterGroups': self._query_filter_groups(patterns)}
+            for patterns in chunks
+        ]
+        
+        total_rows = 0
+        for i in range(0, len(bodies), _GSC_BATCH_SIZE):
+            chunk = bodies[i:i + _GSC_BATCH_SIZE]
+            first_pages = await asyncio.to_thread(
+                self._fetch_first_pages_batch, [(site_url, body) for body in chunk]
+            )
+            for body, rows in zip(chunk, first_pages):
+                total_rows += await self._consume_pages(site_url, body, rows, consume)
+        
+        logger.info(f"Récupéré {total_rows} lignes de données Search Console "
+                    f"({len(queries)} requêtes filtrées)")
+    
+    async def _use_query_filter(self, site_url: str, request_body: Dict, queries: Set[str]) -> bool:
+        """Indique s'il vaut mieux filtrer les requêtes côté serveur que tout récupérer
+        
+        Un snapshot complet encore valide est toujours préféré (aucun appel API).
+        """
+        if len(self._query_filter_chunks(queries)) > _GSC_QUERY_FILTER_MAX_CHUNKS:
+            return False
+        snapshot_path = self._snapshot_path(site_url, request_body)
+        return not await asyncio.to_thread(self._snapshot_is_fresh, snapshot_path)
+    
+    @staticmethod
+    def _query_filter_chunks(queries: Set[str]) -> List[List[str]]:
+        """Motifs des requêtes `queries` répartis en lots d'un filtre chacun (nombre de
+        motifs et longueur d'expression bornés)"""
+        chunks: List[List[str]] = []
+        chunk_length = 0
+        for pattern in map(SearchConsoleService._query_pattern, sorted(queries)):
+            if not chunks or (len(chunks[-1]) >= _GSC_QUERY_FILTER_MAX
+                              or chunk_length + len(pattern) + 1 > _GSC_QUERY_FILTER_MAX_CHARS):
+                chunks.append([])
+                chunk_length = 0
+            chunks[-1].append(pattern)
+            chunk_length += len(pattern) + 1
+        return chunks
+    
+    @staticmethod
+    def _query_pattern(query: str) -> str:
+        """Motif RE2 des requêtes de forme canonique `query` (lettres latines accentuées
+        ou non, espaces multiples)"""
+        classes = _accent_classes()
+        return r'\s+'.join(
+            ''.join(classes.get(char) or re.escape(char) for char in word)
+            for word in query.split(' ')
+        )
+    
+    @staticmethod
+    def _query_filter_groups(patterns: List[str]) -> List[Dict]:
+        """Filtre Search Analytics sur les requêtes correspondant entièrement à l'un des
+        `patterns` (regex ancrée, insensible à la casse)"""
+        return [{
+            'filters': [{
+                'dimension': 'query',
+                'operator': 'includingRegex',
+                'expression': r'(?i)^\s*(?:' + '|'.join(patterns) + r')\s*$'
+            }]
+        }]
+    
+    @staticmethod
+    def _snapshot_prefix(site_url: str) -> str:
+        """Préfixe commun des snapshots d'une propriété (toutes périodes confondues)"""
+        return os.path.join(Config.RESULTS_DIR, f"gsc_{hashlib.sha1(site_url.encode('utf-8')).hexdigest()[:16]}_")
+    
+    @staticmethod
+    def _snapshot_path(site_url: str, request_body: Dict) -> str:
+        """Chemin du snapshot des données d'une propriété pour une période"""
+        period = f"{request_body['startDate']}|{request_body['endDate']}"
+        return (SearchConsoleService._snapshot_prefix(site_url)
+                + f"{hashlib.sha1(period.encode('utf-8')).hexdigest()[:16]}.msgpack")
+    
+    @staticmethod
+    def _snapshot_is_fresh(path: str) -> bool:
+        """Indique si un snapshot existe et a moins de 24h"""
+        try:
+            return time.time() - os.path.getmtime(path) < _SNAPSHOT_MAX_AGE_SECONDS
+        except OSError:
+            return False
+    
+    async def _replay_snapshot(self, path: str, consume: Callable[[Dict], None]) -> int:
+        """Transmet à `consume` les lignes d'un snapshot, lot par lot, et retourne leur nombre
+        
+        Un snapshot illisible est supprimé et l'erreur propagée (lignes déjà transmises).
+        """
+        total_rows = 0
+        try:
+            with open(path, 'rb') as f:
+                while True:
+                    frame = await asyncio.to_thread(_read_snapshot_frame, f)
+                    if frame is None:
+                        break
+                    for item in msgspec.msgpack.decode(frame):
+                        consume(item)
+                        total_rows += 1
+        except (OSError, msgspec.DecodeError):
+            with contextlib.suppress(OSError):
+                os.remove(path)
+            raise
+        return total_rows
+    
+    @staticmethod
+    def _purge_snapshots():
+        """Supprime les snapshots (et fichiers temporaires orphelins) de plus de 24h"""
+        now = time.time()
+        for path in glob.glob(os.path.join(Config.RESULTS_DIR, "gsc_*.msgpack*")):
+            with contextlib.suppress(OSError):
+                if now - os.path.getmtime(path) >= _SNAPSHOT_MAX_AGE_SECONDS:
+                    os.remove(path)
+    
+    def _build_request_body(self, start_date: Optional[datetime],
+                            end_date: Optional[datetime]) -> Dict:
+        """Construit le corps de requête Search Analytics (90 derniers jours par défaut)"""
+        if not end_date:
+            end_date = datetime.now()
+        if not start_date:
+            start_date = end_date - timedelta(days=90)
+        
+        return {
+            'startDate': start_date.strftime('%Y-%m-%d'),
+            'endDate': end_date.strftime('%Y-%m-%d'),
+            'dimensions': ['query', 'page'],
+            'rowLimit': _GSC_ROW_LIMIT  # Maximum autorisé par page
+        }
+    
+    async def _consume_pages(self, site_url: str, request_body: Dict, rows: List[Dict],
+                             consume: Callable[[Dict], None]) -> int:
+        """Transmet la première page puis les suivantes à `consume`, retourne le nombre de lignes
+        
+        Les pages suivantes (startRow) sont récupérées par vagues concurrentes jusqu'à une
+        page incomplète, et consommées dans l'ordre.
+        """
+        total_rows = len(rows)
+        self._consume_rows(rows, consume)
+        
+        start_row = _GSC_ROW_LIMIT
+        while len(rows) == _GSC_ROW_LIMIT:
+            wave = await asyncio.gather(*(
+                asyncio.to_thread(self._fetch_rows, site_url, request_body,
+                                  start_row + i * _GSC_ROW_LIMIT)
+                for i in range(Config.GSC_CONCURRENT_PAGES)
+            ))
+            start_row += len(wave) * _GSC_ROW_LIMIT
+            
+            for rows in wave:
+                total_rows += len(rows)
+                self._consume_rows(rows, consume)
+                if len(rows) < _GSC_ROW_LIMIT:
+                    break
+        
+        return total_rows
+    
+    @staticmethod
+    def _consume_rows(rows: List[Dict], consume: Callable[[Dict], None]):
+        """Transforme les lignes brutes de l'API et les transmet à `consume`"""
+        for row in rows:
+            keys = row.get('keys', [])
+            if len(keys) >= 2:
+                consume({
+                    'query': keys[0],
+                    'page': keys[1],
+                    'clicks': row.get('clicks', 0),
+                    'impressions': row.get('impressions', 0),
+                    'ctr': row.get('ctr', 0),
+                    'position': row.get('position', 0)
+                })
+    
+    def _authorized_http(self) -> AuthorizedHttp:
+        """Connexion autorisée du thread courant, créée une fois par thread et par credentials"""
+        connections = getattr(_THREAD_HTTP, 'connections', None)
+        if connections is None:
+            connections = _THREAD_HTTP.connections = {}
+        
+        fingerprint = self._credentials_fingerprint()
+        http = connections.get(fingerprint)
+        if http is None:
+            http = AuthorizedHttp(self.credentials, http=httplib2.Http(timeout=30))
+            connections[fingerprint] = http
+        else:
+            # Credentials éventuellement rechargés ou rafraîchis par une autre instance
+            http.credentials = self.credentials
+        return http
+    
+    def _fetch_rows(self, site_url: str, request_body: Dict, start_row: int) -> List[Dict]:
+        """Récupère une page Search Analytics (appel bloquant, exécuté dans un thread)"""
+        response = self.service.searchanalytics().query(
+            siteUrl=site_url,
+            body={**request_body, 'startRow': start_row}
+        ).execute(http=self._authorized_http())
+        return response.get('rows', [])
+    
+    def _fetch_first_pages_batch(self, requests: List[Tuple[str, Dict]]) -> List[List[Dict]]:
+        """Récupère la première page de chaque (propriété, corps de requête) en une requête
+        batch (appel bloquant) ; une sous-requête en échec donne une page vide"""
+        pages: List[List[Dict]] = [[] for _ in requests]
+        
+        def collect(request_id, response, exception):
+            index = int(request_id)
+            if exception is not None:
+                logger.error(f"Erreur récupération données Search Console pour {requests[index][0]}: {exception}")
+            else:
+                pages[index] = response.get('rows', [])
+        
+        batch = self.service.new_batch_http_request(callback=collect)
+        for index, (site_url, request_body) in enumerate(requests):
+            batch.add(
+                self.service.searchanalytics().query(
+                    siteUrl=site_url,
+                    body={**request_body, 'startRow': 0}
+                ),
+                request_id=str(index)
+            )
+        batch.execute(http=self._authorized_http())
+        
+        return pages
+    
     async def detect_cannibalization(self, assignments: List[Assignment], 
                                    site_url: Optional[str] = None) -> List[CannibalAlert]:
         """Détecte la cannibalisation en comparant les assignations avec Search Console"""
         try:
+            if not assignments:
+                return []
+            
             if not self.service:
                 logger.warning("Service Search Console non authentifié")
                 return []
             
+            await self.refresh_credentials()
+            
             # Si aucune URL de site fournie, prendre la première propriété
             if not site_url:
                 properties = await self.get_properties()
@@ -176,64 +700,60 @@ class SearchConsoleService:
                     return []
                 site_url = properties[0]['url']
             
-            # Récupérer les données Search Console
-            gsc_data = await self.get_search_analytics_data(site_url)
+            # Page top par requête : en cache pour la propriété et la période
+            request_body = self._build_request_body(None, None)
+            cache_key = (site_url, request_body['startDate'], request_body['endDate'])
+            top_pages = _TOP_PAGES_CACHE.get(cache_key)
+            
+            if top_pages is None:
+                keywords = {self._canonical_query(assignment.keyword) for assignment in assignments}
+                
+                if await self._use_query_filter(site_url, request_body, keywords):
+                    # Peu de mots-clés : filtrage côté serveur, résultat propre au lot (non mis en cache)
+                    top_pages = await self._fetch_top_pages(site_url, request_body, keywords)
+                else:
+                    top_pages = await self._fetch_top_pages(site_url, request_body)
+                    _TOP_PAGES_CACHE[cache_key] = top_pages
             
-            if not gsc_data:
+            if not top_pages.index:
                 logger.warning("Aucune donnée Search Console récupérée")
                 return []
             
-            # Créer un mapping query -> page avec le plus de clics
-            query_to_top_page = {}
-            for row in gsc_data:
-                query = row['query'].lower()
-                page = row['page']
-                clicks = row['clicks']
-                
-                if query not in query_to_top_page or clicks > query_to_top_page[query]['clicks']:
-                    query_to_top_page[query] = {
-                        'page': page,
-                        'clicks': clicks,
-                        'impressions': row['impressions'],
-                        'ctr': row['ctr'],
-                        'position': row['position']
-                    }
-            
-            # Détecter les cannibalisations
-            cannibals = []
+            # Cannibalisation : l'URL assignée diffère (après normalisation) de l'URL top GSC
+            matched = []
             for assignment in assignments:
-                keyword_lower = assignment.keyword.lower()
+                idx = top_pages.index.get(self._canonical_query(assignment.keyword))
+                if idx is not None and (self._normalize_url(assignment.url)
+                                        != self._normalize_url(top_pages.pages[idx])):
+                    matched.append((assignment, idx))
+            
+            if not matched:
+                logger.info("Détection terminée: 0 cannibalisations trouvées")
+                return []
+            
+            # Perte de confiance estimée, calculée sur les colonnes des lignes concernées
+            stats = top_pages.stats[np.fromiter((idx for _, idx in matched), dtype=np.intp, count=len(matched))]
+            confidence_losses = self._confidence_loss_vec(
+                np.fromiter((a.score for a, _ in matched), dtype=float, count=len(matched)),
+                stats['clicks'].astype(float),
+                stats['pos'].astype(float)
+            )
+            
+            cannibals = []
+            for (assignment, idx), gsc_clicks, confidence_loss in zip(
+                matched, stats['clicks'].tolist(), confidence_losses.tolist()
+            ):
+                gsc_top_page = top_pages.pages[idx]
+                cannibals.append(CannibalAlert(
+                    keyword=assignment.keyword,
+                    assigned_url=assignment.url,
+                    gsc_top_url=gsc_top_page,
+                    gsc_clicks=gsc_clicks,
+                    confidence_loss=confidence_loss
+                ))
                 
-                if keyword_lower in query_to_top_page:
-                    gsc_top_page = query_to_top_page[keyword_lower]['page']
-                    gsc_clicks = query_to_top_page[keyword_lower]['clicks']
-                    
-                    # Normaliser les URLs pour la comparaison
-                    assigned_url_normalized = self._normalize_url(assignment.url)
-                    gsc_url_normalized = self._normalize_url(gsc_top_page)
-                    
-                    # Si l'URL assignée est différente de l'URL top dans GSC
-                    if assigned_url_normalized != gsc_url_normalized:
-                        
-                        # Calculer la perte de confiance estimée
-                        confidence_loss = self._calculate_confidence_loss(
-                            assignment.score,
-                            gsc_clicks,
-                            query_to_top_page[keyword_lower]['position']
-                        )
-                        
-                        cannibal = CannibalAlert(
-                            keyword=assignment.keyword,
-                            assigned_url=assignment.url,
-                            gsc_top_url=gsc_top_page,
-                            gsc_clicks=gsc_clicks,
-                            confidence_loss=confidence_loss
-                        )
-                        
-                        cannibals.append(cannibal)
-                        
-                        logger.debug(f"Cannibalisation détectée pour '{assignment.keyword}': "
-                                   f"assigné={assignment.url}, GSC={gsc_top_page}")
+                logger.debug(f"Cannibalisation détectée pour '{assignment.keyword}': "
+                           f"assigné={assignment.url}, GSC={gsc_top_page}")
             
             logger.info(f"Détection terminée: {len(cannibals)} cannibalisations trouvées")
             return cannibals
@@ -242,39 +762,116 @@ class SearchConsoleService:
             logger.error(f"Erreur détection cannibalisation: {e}")
             return []
     
-    def _normalize_url(self, url: str) -> str:
-        """Normalise une URL pour comparaison"""
-        # Supprimer le protocole et les paramètres
-        url = url.lower()
-        url = url.replace('https://', '').replace('http://', '')
-        url = url.split('?')[0]  # Supprimer les paramètres
-        url = url.rstrip('/')    # Supprimer le slash final
+    async def _fetch_top_pages(self, site_url: str, request_body: Dict,
+                               queries: Optional[Set[str]] = None) -> _TopPages:
+        """Récupère les données Search Console (des seules requêtes `queries` si fourni)
+        en ne gardant, au fil de la pagination, que la page avec le plus de clics par
+        requête (première en cas d'égalité)"""
+        index: Dict[str, int] = {}
+        rows = []
+        pages = []
+        
+        def keep_top_page(row: Dict):
+            query = self._canonical_query(row['query'])
+            idx = index.get(query)
+            if idx is None:
+                index[query] = len(pages)
+                rows.append((row['clicks'], row['impressions'], row['ctr'], row['position']))
+                pages.append(row['page'])
+            elif row['clicks'] > rows[idx][0]:
+                rows[idx] = (row['clicks'], row['impressions'], row['ctr'], row['position'])
+                pages[idx] = row['page']
         
-        return url
+        if queries is None:
+            await self._fetch_search_analytics(site_url, request_body, keep_top_page)
+        else:
+            await self._fetch_queries_search_analytics(site_url, request_body, queries, keep_top_page)
+        
+        page_array = np.empty(len(pages), dtype=object)
+        page_array[:] = pages
+        return _TopPages(index, np.array(rows, dtype=_TOP_PAGE_DTYPE), page_array)
     
-    def _calculate_confidence_loss(self, assignment_score: float, 
-                                 gsc_clicks: int, gsc_position: float) -> float:
-        """Calcule la perte de confiance estimée due à la cannibalisation"""
-        # Facteurs de pondération
-        click_weight = min(gsc_clicks / 100, 1.0)  # Normaliser à [0,1]
-        position_penalty = max(0, (gsc_position - 1) / 10)  # Pénalité de position
-        score_factor = 1.0 - assignment_score  # Plus le score est bas, plus la perte est élevée
+    @staticmethod
+    def invalidate(site_url: str):
+        """Invalide les données Search Console en cache d'une propriété (nouvelle ingestion)
+        
+        Les snapshots disque de la propriété sont supprimés pour toutes les périodes,
+        qu'ils aient été écrits par ce processus ou par un autre worker.
+        """
+        for cache_key in [key for key in _TOP_PAGES_CACHE if key[0] == site_url]:
+            _TOP_PAGES_CACHE.pop(cache_key, None)
         
-        # Calcul de la perte (entre 0 et 1)
-        confidence_loss = (click_weight * 0.4 + 
-                          position_penalty * 0.3 + 
-                          score_factor * 0.3)
+        for snapshot_path in glob.glob(SearchConsoleService._snapshot_prefix(site_url) + "*.msgpack"):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(snapshot_path)
+    
+    @staticmethod
+    @lru_cache(maxsize=65536)
+    def _canonical_query(query: str) -> str:
+        """Forme canonique d'une requête / d'un mot-clé : casse, accents et espaces ignorés
+        (les variantes d'une même requête partagent la même page top)"""
+        chars = []
+        for char in unicodedata.normalize('NFKD', query.lower()):
+            # Seuls les accents des lettres latines sont retirés (les marques des autres
+            # écritures, ex. dakuten japonais, changent le sens)
+            if unicodedata.combining(char) and chars and chars[-1].isascii():
+                continue
+            chars.append(char)
+        return _WHITESPACE_RE.sub(' ', unicodedata.normalize('NFC', ''.join(chars))).strip()
+    
+    @staticmethod
+    @lru_cache(maxsize=65536)
+    def _normalize_url(url: str) -> str:
+        """Normalise une URL pour comparaison (mémoïsée : les mêmes URLs reviennent d'un job à l'autre)"""
+        # Protocole, paramètres/ancre et slash final supprimés en une seule passe
+        return _URL_NORM_RE.sub('', url.lower())
+    
+    @staticmethod
+    def _confidence_loss_vec(scores: np.ndarray, clicks: np.ndarray,
+                             positions: np.ndarray) -> np.ndarray:
+        """Calcule la perte de confiance estimée due à la cannibalisation (une valeur
+        entre 0 et 1 par assignation)"""
+        click_weight = np.minimum(clicks / 100, 1.0)  # Normaliser à [0,1]
+        position_penalty = np.clip((positions - 1) / 10, 0, None)  # Pénalité de position
+        score_factor = 1.0 - scores  # Plus le score est bas, plus la perte est élevée
         
-        return min(confidence_loss, 1.0)
+        return np.clip(click_weight * 0.4 + position_penalty * 0.3 + score_factor * 0.3, 0, 1)
+    
+    def _needs_refresh(self) -> bool:
+        """Indique si le token est expiré ou expire dans moins de 5 minutes"""
+        if not self.credentials or not self.credentials.refresh_token:
+            return False
+        if self.credentials.expired:
+            return True
+        expiry = self.credentials.expiry
+        return expiry is not None and (expiry - datetime.utcnow()).total_seconds() < _REFRESH_MARGIN_SECONDS
+    
+    def _reload_saved_credentials(self):
+        """Reprend les credentials persistés s'ils sont plus récents que ceux en mémoire"""
+        try:
+            saved = Credentials.from_authorized_user_file(_TOKEN_PATH)
+        except (OSError, ValueError):
+            return
+        if (saved.refresh_token == self.credentials.refresh_token and saved.expiry
+                and (self.credentials.expiry is None or saved.expiry > self.credentials.expiry)):
+            self.credentials = saved
     
     async def refresh_credentials(self) -> bool:
-        """Rafraîchit les credentials OAuth si nécessaire"""
+        """Rafraîchit les credentials OAuth avant leur expiration (un seul rafraîchissement à la fois)"""
         try:
-            if self.credentials and self.credentials.expired and self.credentials.refresh_token:
-                self.credentials.refresh(Request())
+            if not self._needs_refresh():
+                return False
+            
+            async with _REFRESH_LOCK:
+                # Une autre instance a pu rafraîchir et persister le token pendant l'attente
+                await asyncio.to_thread(self._reload_saved_credentials)
+                if not self._needs_refresh():
+                    return False
+                
+                await asyncio.to_thread(self.credentials.refresh, Request())
+                self._save_credentials()
                 logger.info("Credentials rafraîchis")
                 return True
-            return False
         except Exception as e:
             logger.error(f"Erreur rafraîchissement credentials: {e}")
             return False 
\ No newline at end of file
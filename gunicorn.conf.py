@@ -0,0 +1,22 @@
+"""Configuration Gunicorn (production) : cycle de vie des métriques Prometheus multiprocess"""
+
+import os
+import shutil
+
+from prometheus_client import multiprocess
+
+
+def on_starting(server):
+    """Vide le dossier des métriques multiprocess au démarrage du master (comme run.py) :
+    les fichiers d'un conteneur précédent fausseraient les compteurs et jauges"""
+    multiproc_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if multiproc_dir:
+        shutil.rmtree(multiproc_dir, ignore_errors=True)
+        os.makedirs(multiproc_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    """Exclut un worker terminé des jauges « live » : recyclé (--max-requests) ou tué
+    sur timeout, il n'exécute pas l'arrêt du lifespan de l'application"""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(worker.pid)
@@ -4,42 +4,41 @@ Script de démarrage pour Keyword-URL Matcher v2 Premium
 """
 
 import os
+import shutil
 import sys
 import uvicorn
+from concurrent.futures import ThreadPoolExecutor
 from app.config import Config
 
 def main():
     """Point d'entrée principal"""
     
-    # Vérifier que Redis est accessible
-    try:
-        import redis
-        redis_client = redis.from_url(Config.REDIS_URL)
-        redis_client.ping()
-        print("✅ Connexion Redis OK")
-    except Exception as e:
-        print(f"❌ Erreur connexion Redis: {e}")
-        print("Assurez-vous que Redis est démarré : redis-server")
-        sys.exit(1)
+    # Créer les dossiers nécessaires (en parallèle : lent sur volumes réseau)
+    directories = [Config.UPLOAD_DIR, Config.RESULTS_DIR, Config.MODELS_DIR, "templates", "static"]
+    with ThreadPoolExecutor(max_workers=len(directories)) as executor:
+        list(executor.map(lambda path: os.makedirs(path, exist_ok=True), directories))
     
-    # Créer les dossiers nécessaires
-    os.makedirs(Config.UPLOAD_DIR, exist_ok=True)
-    os.makedirs(Config.RESULTS_DIR, exist_ok=True)
-    os.makedirs(Config.MODELS_DIR, exist_ok=True)
-    os.makedirs("templates", exist_ok=True)
-    os.makedirs("static", exist_ok=True)
+    # Métriques Prometheus en mode multiprocess : dossier vidé à chaque démarrage,
+    # défini avant le premier import de prometheus_client
+    shutil.rmtree(Config.PROMETHEUS_MULTIPROC_DIR, ignore_errors=True)
+    os.makedirs(Config.PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = os.path.abspath(Config.PROMETHEUS_MULTIPROC_DIR)
     
     print("🚀 Démarrage Keyword-URL Matcher v2 Premium")
     print(f"📊 Interface web: http://localhost:8000")
     print(f"📋 API docs: http://localhost:8000/docs")
     print(f"📈 Métriques: http://localhost:{Config.PROMETHEUS_PORT}/metrics")
     
-    # Démarrer l'application
+    # Démarrer l'application : rechargement auto en DEBUG, sinon plusieurs workers
+    # (uvloop/httptools, métriques agrégées via PROMETHEUS_MULTIPROC_DIR)
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
         port=8000,
         reload=Config.DEBUG,
+        workers=1 if Config.DEBUG else Config.API_WORKERS,
+        loop="auto" if sys.platform == "win32" else "uvloop",
+        http="httptools",
         log_level="info",
         access_log=True
     )
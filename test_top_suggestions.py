@@ -26,6 +26,9 @@ async def test_top_suggestions():
         print(f"❌ Fichiers manquants")
         return
     
+    # Une seule instance de JobManager (connexion Redis partagée entre les itérations)
+    job_manager = JobManager()
+    
     # Test avec different valeurs de top_suggestions
     for top_suggestions in [1, 3, 5]:
         print(f"\n🧪 Test avec top_suggestions = {top_suggestions}")
@@ -39,7 +42,6 @@ async def test_top_suggestions():
         }
         
         test_job_id = f"test_suggestions_{top_suggestions}"
-        job_manager = JobManager()
         
         try:
             await job_manager.run_matching_job(test_job_id, params)
@@ -70,6 +72,8 @@ async def test_top_suggestions():
             print(f"   ❌ Erreur: {e}")
             import traceback
             traceback.print_exc()
+    
+    await job_manager.close()
 
 if __name__ == "__main__":
     asyncio.run(test_top_suggestions()) 
\ No newline at end of file